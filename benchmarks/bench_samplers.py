@@ -0,0 +1,184 @@
+"""Benchmark of the fit and select_samples steps of every sampler.
+
+Samplers are run on synthetic pools over a grid of pool sizes, dimensions,
+numbers of classes and batch sizes. For each case, the best wall time over
+several repeats and the peak memory allocated, measured with tracemalloc in
+a separate run, are recorded. Results are saved in a JSON file named after
+the current commit so that two commits can be compared. Run with:
+
+    python benchmarks/bench_samplers.py --samplers margin kmeans
+    python benchmarks/bench_samplers.py --compare results/a.json results/b.json
+
+The default grid is small enough to run in a few minutes. Use --n-samples,
+--n-features, --n-classes and --batch-size to extend it.
+"""
+import argparse
+import itertools
+import json
+import os
+import subprocess
+import tracemalloc
+from time import perf_counter
+
+import numpy as np
+from sklearn.datasets import make_classification
+from sklearn.linear_model import LogisticRegression
+
+from cardinal.batch import RankedBatchSampler
+from cardinal.coreset import CoresetSampler
+from cardinal.clustering import KMeansSampler, MiniBatchKMeansSampler
+from cardinal.pool import ActiveLearningPool
+from cardinal.random import RandomSampler
+from cardinal.submodularity import SubmodularSampler
+from cardinal.uncertainty import (ConfidenceSampler, EntropySampler,
+                                  MarginSampler)
+from cardinal.zhdanov2019 import TwoStepKMeansSampler
+
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                           'results')
+
+# Factories taking the batch size and returning a new sampler
+SAMPLERS = {
+    'random': lambda b: RandomSampler(b, random_state=0),
+    'confidence': lambda b: ConfidenceSampler(LogisticRegression(), b),
+    'margin': lambda b: MarginSampler(LogisticRegression(), b),
+    'entropy': lambda b: EntropySampler(LogisticRegression(), b),
+    'ranked_batch': lambda b: RankedBatchSampler(b),
+    'kmeans': lambda b: KMeansSampler(b, random_state=0, n_init=1),
+    'minibatch_kmeans': lambda b: MiniBatchKMeansSampler(
+        b, random_state=0, n_init=1),
+    'coreset': lambda b: CoresetSampler(b),
+    'submodular': lambda b: SubmodularSampler(b, optimizer='lazy'),
+    'two_step_kmeans': lambda b: TwoStepKMeansSampler(
+        5, LogisticRegression(), b, random_state=0, n_init=1),
+}
+
+
+def make_pool(n_samples: int, n_features: int, n_classes: int,
+              n_labeled: int = 100, random_state: int = 0):
+    """Generates a synthetic classification pool.
+
+    Returns:
+        The labeled samples, their labels and an ActiveLearningPool of
+        n_samples unlabeled samples.
+    """
+    n_labeled = max(n_labeled, n_classes)
+    X, y = make_classification(
+        n_samples + n_labeled, n_features=n_features,
+        n_informative=min(n_features, max(2, n_classes)),
+        n_redundant=0, n_classes=n_classes, n_clusters_per_class=1,
+        random_state=random_state)
+    X = X.astype(np.float32)
+    # Make sure that every class is labeled
+    _, first = np.unique(y, return_index=True)
+    labeled = np.union1d(first, np.arange(n_labeled - first.shape[0]))
+    pool = ActiveLearningPool(X, y, labeled=labeled)
+    X_labeled, y_labeled = pool.get_labeled()
+    return X_labeled, y_labeled, pool
+
+
+def _run(name: str, batch_size: int, X_labeled, y_labeled, pool):
+    sampler = SAMPLERS[name](batch_size)
+    sampler.fit(X_labeled, y_labeled)
+    return sampler.select_samples(pool)
+
+
+def bench_case(name: str, n_samples: int, n_features: int, n_classes: int,
+               batch_size: int, n_repeat: int = 3) -> dict:
+    """Measures wall time and peak memory of a sampler on a pool."""
+    X_labeled, y_labeled, pool = make_pool(n_samples, n_features, n_classes)
+
+    times = []
+    for _ in range(n_repeat):
+        start = perf_counter()
+        _run(name, batch_size, X_labeled, y_labeled, pool)
+        times.append(perf_counter() - start)
+
+    # tracemalloc slows down allocations, so memory is measured apart
+    tracemalloc.start()
+    _run(name, batch_size, X_labeled, y_labeled, pool)
+    peak_memory = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return {'sampler': name, 'n_samples': n_samples,
+            'n_features': n_features, 'n_classes': n_classes,
+            'batch_size': batch_size, 'time': min(times),
+            'peak_memory': peak_memory}
+
+
+def current_commit() -> str:
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def _case_key(result: dict) -> tuple:
+    return (result['sampler'], result['n_samples'], result['n_features'],
+            result['n_classes'], result['batch_size'])
+
+
+def compare(path_a: str, path_b: str):
+    """Prints the time and memory ratios of results b over results a."""
+    with open(path_a) as f:
+        results_a = {_case_key(r): r for r in json.load(f)['results']}
+    with open(path_b) as f:
+        results_b = {_case_key(r): r for r in json.load(f)['results']}
+
+    print('{:>18} {:>9} {:>5} {:>5} {:>6} {:>10} {:>10}'.format(
+        'sampler', 'n_samples', 'dim', 'cls', 'batch', 'time', 'memory'))
+    for key in sorted(set(results_a) & set(results_b)):
+        a, b = results_a[key], results_b[key]
+        print('{:>18} {:>9} {:>5} {:>5} {:>6} {:>9.2f}x {:>9.2f}x'.format(
+            *key, b['time'] / a['time'],
+            b['peak_memory'] / max(a['peak_memory'], 1)))
+
+
+def main(samplers=tuple(SAMPLERS), n_samples=(1000, 10000),
+         n_features=(16, 128), n_classes=(2, 10), batch_size=(10, 100),
+         n_repeat=3, output=None):
+    results = []
+    print('{:>18} {:>9} {:>5} {:>5} {:>6} {:>10} {:>10}'.format(
+        'sampler', 'n_samples', 'dim', 'cls', 'batch', 'time (s)',
+        'peak (MB)'))
+    for case in itertools.product(samplers, n_samples, n_features,
+                                  n_classes, batch_size):
+        result = bench_case(*case, n_repeat=n_repeat)
+        results.append(result)
+        print('{:>18} {:>9} {:>5} {:>5} {:>6} {:>10.4f} {:>10.1f}'.format(
+            *case, result['time'], result['peak_memory'] / 2 ** 20))
+
+    commit = current_commit()
+    if output is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        output = os.path.join(RESULTS_DIR, '{}.json'.format(commit))
+    with open(output, 'w') as f:
+        json.dump({'commit': commit, 'results': results}, f, indent=1)
+    print('Results saved in {}'.format(output))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--samplers', nargs='+', default=list(SAMPLERS),
+                        choices=list(SAMPLERS))
+    parser.add_argument('--n-samples', nargs='+', type=int,
+                        default=[1000, 10000])
+    parser.add_argument('--n-features', nargs='+', type=int,
+                        default=[16, 128])
+    parser.add_argument('--n-classes', nargs='+', type=int, default=[2, 10])
+    parser.add_argument('--batch-size', nargs='+', type=int,
+                        default=[10, 100])
+    parser.add_argument('--n-repeat', type=int, default=3)
+    parser.add_argument('--output', help='Path of the JSON results')
+    parser.add_argument('--compare', nargs=2, metavar=('A', 'B'),
+                        help='Compare two result files instead of running')
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+    else:
+        main(args.samplers, args.n_samples, args.n_features, args.n_classes,
+             args.batch_size, args.n_repeat, args.output)
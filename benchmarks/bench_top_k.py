@@ -0,0 +1,39 @@
+"""Benchmark of the top-k selection used by ScoredQuerySampler.
+
+Compares the full argsort previously used to select the highest scores with
+the partial sort of cardinal.utils.top_k. Run with:
+
+    python benchmarks/bench_top_k.py
+"""
+from time import perf_counter
+
+import numpy as np
+
+from cardinal.utils import top_k
+
+
+def _best_time(func, n_repeat=3):
+    times = []
+    for _ in range(n_repeat):
+        start = perf_counter()
+        func()
+        times.append(perf_counter() - start)
+    return min(times)
+
+
+def main(pool_sizes=(10 ** 4, 10 ** 5, 10 ** 6, 10 ** 7), batch_size=200):
+    rng = np.random.RandomState(0)
+    print('{:>12} {:>12} {:>12} {:>12} {:>9}'.format(
+        'n_samples', 'argsort (s)', 'top_k (s)', 'unstable (s)', 'speedup'))
+    for n_samples in pool_sizes:
+        scores = rng.rand(n_samples)
+        t_sort = _best_time(lambda: np.argsort(scores)[-batch_size:])
+        t_top = _best_time(lambda: top_k(scores, batch_size))
+        t_unstable = _best_time(
+            lambda: top_k(scores, batch_size, stable=False))
+        print('{:>12} {:>12.5f} {:>12.5f} {:>12.5f} {:>8.1f}x'.format(
+            n_samples, t_sort, t_top, t_unstable, t_sort / t_top))
+
+
+if __name__ == '__main__':
+    main()
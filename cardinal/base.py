@@ -1,11 +1,17 @@
-from typing import List
+from typing import Iterable, List
 from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
 from warnings import warn
 
 import numpy as np
 
 from .typeutils import (RandomStateType, check_random_state,
                         NotEnoughSamplesWarning)
+from .utils import (top_k, chunk_slices, effective_n_jobs,
+                    weighted_sampling_keys, is_out_of_core,
+                    DEFAULT_CHUNK_SIZE)
+from .pool import ActiveLearningPool, read_slice
+from .profiling import NULL_STAGE, SamplerProfile
 
 
 class BaseQuerySampler(ABC):
@@ -16,10 +22,55 @@ class BaseQuerySampler(ABC):
 
     Args:
         batch_size: Numbers of samples to select.
+
+    Attributes:
+        profile_: SamplerProfile recording the time spent in each stage of
+            the sampler, only present once enable_profiling is called.
     """
     def __init__(self, batch_size: int):
         self.batch_size = batch_size
 
+    def enable_profiling(self, logger=None,
+                         track_memory: bool = False) -> 'BaseQuerySampler':
+        """Records statistics about the stages of the sampler in profile_.
+
+        Args:
+            logger: If specified, stage statistics are logged to it.
+            track_memory: If True, memory allocated in each stage is
+                measured with tracemalloc.
+
+        Returns:
+            The object itself
+        """
+        self.disable_profiling()
+        self.profile_ = SamplerProfile(logger=logger,
+                                       track_memory=track_memory)
+        return self
+
+    def disable_profiling(self) -> 'BaseQuerySampler':
+        """Stops recording stage statistics and removes profile_.
+
+        tracemalloc is stopped if it was started by enable_profiling.
+
+        Returns:
+            The object itself
+        """
+        profile = self.__dict__.pop('profile_', None)
+        if profile is not None:
+            profile.close()
+        return self
+
+    def _stage(self, name: str, n_rows: int = 0):
+        """Returns a context measuring a stage if profiling is enabled.
+
+        When profiling is disabled, a shared no-op context is returned so
+        that instrumented code runs at nearly the same speed.
+        """
+        profile = self.__dict__.get('profile_')
+        if profile is None:
+            return NULL_STAGE
+        return profile.stage(name, n_rows)
+
     @abstractmethod
     def fit(self, X: np.ndarray, y: np.ndarray = None):
         """Fit the model on labeled samples.
@@ -38,18 +89,44 @@ class BaseQuerySampler(ABC):
         """Selects the samples to annotate from unlabeled data.
 
         Args:
-            X: Pool of unlabeled samples of shape (n_samples, n_features).
+            X: Pool of unlabeled samples of shape (n_samples, n_features),
+                or an ActiveLearningPool.
 
         Returns:
-            Indices of the selected samples of shape (batch_size).
+            Indices of the selected samples of shape (batch_size). If X is an
+            ActiveLearningPool, these are indices in the pool.
         """
         pass
 
+    def _select_from_pool(self, pool: ActiveLearningPool,
+                          **kwargs) -> np.array:
+        """Selects samples among the unlabeled samples of a pool.
+
+        By default, unlabeled samples are gathered and given to
+        select_samples, or given as a chunked array if the pool is out of
+        core. Samplers able to process the pool by chunks override this
+        method. Per sample arguments are given for the whole pool.
+
+        Returns:
+            Global indices of the selected samples in the pool.
+        """
+        unlabeled_index = pool.unlabeled_index
+        kwargs = {key: value[unlabeled_index] if value is not None else None
+                  for key, value in kwargs.items()}
+        if is_out_of_core(pool.X):
+            X = pool.unlabeled_view()
+        else:
+            X = pool.get_unlabeled()
+        return pool.to_global(self.select_samples(X, **kwargs))
+
     def _not_enough_samples(self, X: np.array) -> bool:
-        cond = X.shape[0] < self.batch_size
+        return self._not_enough_n_samples(X.shape[0])
+
+    def _not_enough_n_samples(self, n_samples: int) -> bool:
+        cond = n_samples < self.batch_size
         if cond:
             warn(f'''Requested {self.batch_size} samples but data only
-             has {X.shape[0]}. All available data will be returned''',
+             has {n_samples}. All available data will be returned''',
                  NotEnoughSamplesWarning)
         return cond
 
@@ -63,14 +140,35 @@ class ScoredQuerySampler(BaseQuerySampler):
     Args:
         batch_size: Numbers of samples to select.
         strategy: Describes how to select the samples based on scores. Can be
-                  "top", "weighted".
+                  "top", "weighted", "softmax". "weighted" draws samples
+                  without replacement with probabilities proportional to
+                  scores ** (1 / temperature), non positive scores being
+                  drawn uniformly at random only once positive ones are
+                  exhausted. "softmax" uses exp(scores / temperature). NaN
+                  scores are always selected last.
         random_state: Random seeding
+        chunk_size: If specified, samples are scored by chunks of chunk_size
+            rows and only the best batch_size scores are kept in memory.
+            Out-of-core pools (see cardinal.utils.is_out_of_core) are always
+            scored by chunks, of DEFAULT_CHUNK_SIZE rows by default.
+        n_jobs: Number of threads used to score the pool. The pool is split
+            in shards (of chunk_size rows if specified) that are scored
+            concurrently, the best samples of each shard are then merged.
+            -1 means using all cores. Random strategies are not reproducible
+            when n_jobs is not 1.
+        temperature: Temperature of the "weighted" and "softmax" strategies.
+            Lower values concentrate the draws on the highest scores.
     """
     def __init__(self, batch_size: int, strategy: str = 'top',
-                 random_state: RandomStateType = None):
+                 random_state: RandomStateType = None,
+                 chunk_size: int = None, n_jobs: int = 1,
+                 temperature: float = 1.):
         super().__init__(batch_size)
         self.strategy = strategy
         self.random_state = check_random_state(random_state)
+        self.chunk_size = chunk_size
+        self.n_jobs = n_jobs
+        self.temperature = temperature
 
     @abstractmethod
     def score_samples(self, X: np.array) -> np.array:
@@ -88,25 +186,159 @@ class ScoredQuerySampler(BaseQuerySampler):
         """Selects the samples from unlabeled data using the internal scoring.
 
         Args:
-            X: Pool of unlabeled samples of shape (n_samples, n_features).
-            strategy: Strategy to use to select queries. Can be one of top,
-                      linear_choice, or squared_choice.
+            X: Pool of unlabeled samples of shape (n_samples, n_features),
+                or an ActiveLearningPool.
 
         Returns:
             Indices of the selected samples of shape (batch_size).
         """
+        if isinstance(X, ActiveLearningPool):
+            return self._select_from_pool(X)
+
         if self._not_enough_samples(X):
             return np.arange(X.shape[0])
 
-        sample_scores = self.score_samples(X)
+        chunk_size = self.chunk_size
+        if chunk_size is None and is_out_of_core(X):
+            chunk_size = DEFAULT_CHUNK_SIZE
+
+        n_jobs = effective_n_jobs(self.n_jobs)
+        if n_jobs > 1:
+            return self._select_samples_parallel(
+                lambda s: self._slice_top_k(X, s), X.shape[0], n_jobs,
+                chunk_size)
+
+        if chunk_size is not None:
+            return self._merge_top_k(
+                self._slice_top_k(X, s)
+                for s in chunk_slices(X.shape[0], chunk_size))
+
+        with self._stage('score', X.shape[0]):
+            sample_scores = self.score_samples(X)
         self.sample_scores_ = sample_scores
+        with self._stage('select', X.shape[0]):
+            return top_k(self._selection_keys(sample_scores),
+                         self.batch_size)
+
+    def _selection_keys(self, scores: np.array) -> np.array:
+        """Turns scores into keys such that the batch_size highest keys are
+        the selected samples.
+
+        Random strategies use the keys of Efraimidis and Spirakis: drawing the
+        samples with the highest keys is equivalent to successive weighted
+        draws without replacement. Keys are independent from one sample to
+        the other so they can be computed by chunks.
+        """
         if self.strategy == 'top':
-            index = np.argsort(sample_scores)[-self.batch_size:]
+            # NaN scores would otherwise be ranked first
+            return np.where(np.isnan(scores), -np.inf, scores)
         elif self.strategy == 'weighted':
-            index = self.random_state.choice(
-                np.arange(X.shape[0]), size=self.batch_size,
-                replace=False, p=sample_scores / np.sum(sample_scores))
+            with np.errstate(divide='ignore', invalid='ignore'):
+                log_weights = np.log(np.maximum(scores, 0))
+            log_weights /= self.temperature
+        elif self.strategy == 'softmax':
+            log_weights = scores / self.temperature
         else:
             raise ValueError('Unknown sample selection strategy {}'
                              .format(self.strategy))
-        return index
+        return weighted_sampling_keys(log_weights, self.random_state)
+
+    def select_samples_iter(self, chunks: Iterable[np.array]) -> np.array:
+        """Selects the samples from a pool given as successive chunks.
+
+        Chunks are scored one at a time and only the best batch_size scores
+        seen so far are kept, so the memory used is bounded by the size of a
+        chunk. Since scores are not all kept, sample_scores_ is set to None.
+
+        Args:
+            chunks: Iterable of arrays of shape (n_chunk_samples, n_features)
+                that, concatenated, form the pool of unlabeled samples.
+
+        Returns:
+            Indices of the selected samples in the concatenated pool of shape
+            (batch_size).
+        """
+        def chunk_results():
+            offset = 0
+            for chunk in chunks:
+                result = self._chunk_top_k(chunk, offset)
+                offset += result[2]
+                yield result
+
+        return self._merge_top_k(chunk_results())
+
+    def _select_from_pool(self, pool: ActiveLearningPool) -> np.array:
+        # Unlabeled samples are scored by chunks, never gathered at once
+        if self._not_enough_n_samples(pool.n_unlabeled):
+            return pool.unlabeled_index
+
+        chunk_size = self.chunk_size or pool.chunk_size
+        n_jobs = effective_n_jobs(self.n_jobs)
+        if n_jobs > 1:
+            selected = self._select_samples_parallel(
+                lambda s: self._slice_top_k(pool, s), pool.n_unlabeled,
+                n_jobs, chunk_size)
+        else:
+            selected = self._merge_top_k(
+                self._slice_top_k(pool, s)
+                for s in chunk_slices(pool.n_unlabeled, chunk_size))
+        return pool.to_global(selected)
+
+    def _slice_top_k(self, X, s: slice):
+        with self._stage('score', s.stop - s.start):
+            scores = self._score_slice(X, s)
+        return self._scores_top_k(scores, s.start)
+
+    def _score_slice(self, X, s: slice) -> np.array:
+        """Scores a slice of rows of X, or of the unlabeled samples of X if
+        it is an ActiveLearningPool.
+
+        Samplers able to reuse results computed for the same slice, such as
+        probabilities cached by a ProbaCache, override this method.
+        """
+        return self.score_samples(read_slice(X, s))
+
+    def _select_samples_parallel(self, slice_top_k, n_samples: int,
+                                 n_jobs: int, chunk_size: int) -> np.array:
+        shard_size = chunk_size
+        if shard_size is None:
+            shard_size = -(-n_samples // n_jobs)
+
+        # Threads share X, so shards are views and nothing is copied. Most of
+        # the time is spent in NumPy or in the classifier that release the GIL.
+        with ThreadPoolExecutor(n_jobs) as executor:
+            return self._merge_top_k(executor.map(
+                slice_top_k, chunk_slices(n_samples, shard_size)))
+
+    def _chunk_top_k(self, chunk: np.array, offset: int):
+        with self._stage('score', chunk.shape[0]):
+            scores = self.score_samples(chunk)
+        return self._scores_top_k(scores, offset)
+
+    def _scores_top_k(self, scores: np.array, offset: int):
+        with self._stage('select', scores.shape[0]):
+            keys = self._selection_keys(scores)
+            index = top_k(keys, self.batch_size)
+        return keys[index], index + offset, keys.shape[0]
+
+    def _merge_top_k(self, results) -> np.array:
+        """Merges the best samples of chunks given in the order of the pool.
+        """
+        best_scores = np.empty(0)
+        best_index = np.empty(0, dtype=np.intp)
+        n_samples = 0
+
+        for chunk_scores, chunk_index, n_chunk in results:
+            # Indices of a chunk are greater than the ones already seen. Ties
+            # are therefore broken as if the pool was scored at once.
+            with self._stage('merge', chunk_scores.shape[0]):
+                scores = np.concatenate([best_scores, chunk_scores])
+                index = np.concatenate([best_index, chunk_index])
+                kept = top_k(scores, self.batch_size)
+            best_scores, best_index = scores[kept], index[kept]
+            n_samples += n_chunk
+
+        self.sample_scores_ = None
+        if self._not_enough_n_samples(n_samples):
+            return np.arange(n_samples)
+        return best_index
@@ -1,14 +1,20 @@
 # Note: This code is inspired from modAL implementation
 # https://modal-python.readthedocs.io/en/latest/content/query_strategies/ranked_batch_mode.html
 
+from warnings import warn
+
 import numpy as np
 
 from .version import check_modules
 check_modules('sklearn', 'batch')  # noqa
 
-from sklearn.metrics import pairwise_distances, pairwise_distances_argmin_min
+from sklearn.metrics import pairwise_distances
 
 from .base import BaseQuerySampler
+from .pool import ActiveLearningPool
+from .neighbors import BaseNeighborIndex, check_neighbor_index
+from .utils import (chunk_slices, is_out_of_core, read_rows,
+                    DEFAULT_CHUNK_SIZE)
 
 
 class RankedBatchSampler(BaseQuerySampler):
@@ -17,10 +23,28 @@ class RankedBatchSampler(BaseQuerySampler):
     Args:
         batch_size: Number of samples to select.
         metric: Metric to use for distance computation.
+        neighbors: Index used to find the closest labeled sample of each
+            unlabeled sample. Either a BaseNeighborIndex instance or one of
+            "brute" (default), "kd_tree", "ball_tree" and
+            "random_projection" (approximate).
+        warm_start: If True, the neighbor index is kept between calls to
+            select_samples and only the newly labeled samples are added to
+            it. This requires X to be the same pool at every call.
+        chunk_size: Number of rows read at once from out-of-core pools (see
+            cardinal.utils.is_out_of_core). Such pools are read sequentially
+            once per selected sample and never loaded entirely in memory.
+
+    Attributes:
+        neighbors_: The neighbor index built on labeled samples.
     """
-    def __init__(self, batch_size: int, metric: str = 'euclidean'):
+    def __init__(self, batch_size: int, metric: str = 'euclidean',
+                 neighbors=None, warm_start: bool = False,
+                 chunk_size: int = DEFAULT_CHUNK_SIZE):
         super().__init__(batch_size)
         self.metric = metric
+        self.neighbors = neighbors
+        self.warm_start = warm_start
+        self.chunk_size = chunk_size
 
     def fit(self, X: np.array, y: np.array = None) -> 'RankedBatchSampler':
         """Does nothing, RankedBatch is unsupervised.
@@ -34,53 +58,125 @@ class RankedBatchSampler(BaseQuerySampler):
         """
         return self
 
-    def select_samples(self, X: np.array,
-                       samples_weights: np.array) -> np.array:
+    def select_samples(self, X: np.array, sample_weight: np.array = None,
+                       samples_weights: np.array = None) -> np.array:
         """Selects the samples to annotate from unlabelled data.
         
         Args:
-            X: Pool of unlabeled samples of shape (n_samples, n_features).
-            sample_weights: Weights of the samples of shape (n_samples).
-                Set labeled samples as -1.
+            X: Pool of unlabeled samples of shape (n_samples, n_features),
+                or an ActiveLearningPool.
+            sample_weight: Weights of the samples of shape (n_samples).
+                Set labeled samples as -1. If not specified, all the samples
+                are unlabeled with a weight of 0, unless X is an
+                ActiveLearningPool, labeled samples being then taken from it.
+            samples_weights: Deprecated alias of sample_weight.
 
         Returns:
             Indices of the selected samples of shape (batch_size).
         """
-        if self._not_enough_samples(X):
-            return np.arange(X.shape[0])
+        if samples_weights is not None:
+            warn('samples_weights is deprecated, use sample_weight instead',
+                 DeprecationWarning)
+            sample_weight = samples_weights
+
+        if isinstance(X, ActiveLearningPool):
+            # The pool is processed as a whole, indices are already global
+            if sample_weight is None:
+                sample_weight = np.zeros(X.n_samples)
+            sample_weight = np.array(sample_weight, dtype=float)
+            sample_weight[X.labeled_mask] = -1
+            return self.select_samples(X.X, sample_weight)
+
+        if sample_weight is None:
+            sample_weight = np.zeros(X.shape[0])
 
         n_samples = X.shape[0]
-        index = np.arange(n_samples)
-        unlabeled_mask = (samples_weights > -.5)
-        n_unlabeled = unlabeled_mask.sum()
-
-        # We are going to modify this array so we copy it
-        samples_weights = samples_weights.copy()
-
-        # We compute the distances for labeled data in 2 steps
-        _, similarity_scores = pairwise_distances_argmin_min(
-            X[unlabeled_mask], X[np.logical_not(unlabeled_mask)],
-            metric=self.metric)
-        similarity_scores = 1 / (1 + similarity_scores)
-
+        unlabeled_mask = (sample_weight > -.5)
+        unlabeled_index = np.flatnonzero(unlabeled_mask)
+        n_unlabeled = unlabeled_index.shape[0]
+
+        # Labeled samples can never be selected
+        if self._not_enough_n_samples(n_unlabeled):
+            return unlabeled_index
+
+        if is_out_of_core(X):
+            # Unlabeled samples are read block by block at each pass
+            def map_unlabeled(func):
+                return np.concatenate([
+                    func(read_rows(X, s)[unlabeled_mask[s]])
+                    for s in chunk_slices(n_samples, self.chunk_size)])
+
+            def get_unlabeled(i):
+                i = unlabeled_index[i]
+                return read_rows(X, slice(i, i + 1))
+        else:
+            # The unlabeled pool is extracted once, all the following
+            # operations are done in place on arrays of size n_unlabeled.
+            X_unlabeled = read_rows(X, unlabeled_index)
+
+            def map_unlabeled(func):
+                return func(X_unlabeled)
+
+            def get_unlabeled(i):
+                return X_unlabeled[i:i + 1]
+
+        weights = sample_weight[unlabeled_index].astype(float)
+
+        # Similarity of each unlabeled sample to its closest labeled sample
+        if n_unlabeled < n_samples:
+            with self._stage('neighbors', n_unlabeled):
+                neighbors = self._update_neighbors(
+                    X, np.logical_not(unlabeled_mask))
+                similarity_scores = 1 / (1 + map_unlabeled(neighbors.query))
+        else:
+            similarity_scores = np.zeros(n_unlabeled)
+
+        scores = np.empty(n_unlabeled)
+        selected = np.zeros(n_unlabeled, dtype=bool)
         selected_samples = []
 
-        for _ in range(self.batch_size):
-
-            alpha = n_unlabeled / n_samples
-            scores = (alpha * (1 - similarity_scores)
-                      + (1 - alpha) * samples_weights[unlabeled_mask])
-
-            idx_furthest = index[unlabeled_mask][np.argmax(scores)]
-            selected_samples.append(idx_furthest)
-
-            # Update similarities considering the selected sample as labeled
-            # We could remove its value from the array but we avoid realloc
-            sim = 1 / (1 + pairwise_distances(
-                X[unlabeled_mask], X[idx_furthest, None],
-                metric=self.metric)[:, 0])
-            similarity_scores = np.max([similarity_scores, sim], axis=0)
-            samples_weights[idx_furthest] = 0.
-            n_unlabeled -= 1
+        with self._stage('ranking', n_unlabeled):
+            for _ in range(self.batch_size):
+
+                alpha = n_unlabeled / n_samples
+                np.subtract(1, similarity_scores, out=scores)
+                scores *= alpha
+                scores += (1 - alpha) * weights
+                # Selected samples are removed by masking, without
+                # reallocation
+                scores[selected] = -np.inf
+
+                idx_furthest = np.argmax(scores)
+                selected_samples.append(unlabeled_index[idx_furthest])
+                selected[idx_furthest] = True
+
+                # Update similarities considering the selected sample as
+                # labeled
+                x_furthest = get_unlabeled(idx_furthest)
+                distances = map_unlabeled(
+                    lambda X_block: pairwise_distances(
+                        X_block, x_furthest, metric=self.metric)[:, 0])
+                distances += 1
+                np.reciprocal(distances, out=distances)
+                np.maximum(similarity_scores, distances,
+                           out=similarity_scores)
+                weights[idx_furthest] = 0.
+                n_unlabeled -= 1
 
         return np.asarray(selected_samples)
+
+    def _update_neighbors(self, X: np.array,
+                          labeled_mask: np.array) -> BaseNeighborIndex:
+        previous_mask = getattr(self, 'labeled_mask_', None)
+        if (self.warm_start and previous_mask is not None
+                and previous_mask.shape == labeled_mask.shape
+                and not np.any(previous_mask & ~labeled_mask)):
+            new_mask = labeled_mask & ~previous_mask
+            if np.any(new_mask):
+                self.neighbors_.add(read_rows(X, np.flatnonzero(new_mask)))
+        else:
+            self.neighbors_ = check_neighbor_index(self.neighbors, self.metric)
+            self.neighbors_.fit(
+                read_rows(X, np.flatnonzero(labeled_mask)))
+        self.labeled_mask_ = labeled_mask
+        return self.neighbors_
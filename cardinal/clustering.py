@@ -2,9 +2,32 @@ import numpy as np
 from scipy.optimize import linear_sum_assignment
 
 from .base import BaseQuerySampler
+from .pool import ActiveLearningPool
+from .utils import chunk_slices, is_out_of_core, read_rows
 from .version import check_modules
 
 
+def _warm_start_from_centers(template, fitted, X: np.array, max_iter: int):
+    """Returns a KMeans-like estimator initialized with fitted centers.
+
+    Between two active learning iterations, the pool only loses the selected
+    samples, so previous centers are a good initialization requiring few
+    iterations to converge. The template is cloned so that its parameters
+    are left untouched.
+
+    Returns:
+        The warm started clone of template, or None if there is no usable
+        fitted estimator.
+    """
+    from sklearn.base import clone
+
+    centers = getattr(fitted, 'cluster_centers_', None)
+    if centers is None or centers.shape[1] != X.shape[1]:
+        return None
+    return clone(template).set_params(init=centers, n_init=1,
+                                      max_iter=max_iter)
+
+
 class KCentroidSampler(BaseQuerySampler):
     """ KCentroid based query sampler.
     In order to increase diversity, it is possible to use a centroid based
@@ -13,13 +36,43 @@ class KCentroidSampler(BaseQuerySampler):
     Args:
         clustering: A clustering algorithm matching the sklearn interface
         batch_size: Number of samples to draw when predicting.
+        assignment: How samples are assigned to centroids. "exact" solves the
+            assignment on the full (n_samples, batch_size) distance matrix.
+            "sparse" only considers the n_candidates closest samples of each
+            centroid, computing distances by chunks of chunk_size samples.
+        n_candidates: Number of candidates per centroid in "sparse"
+            assignment. Defaults to batch_size, for which the solution is the
+            same as the exact one. Lower values are faster but approximate.
+        chunk_size: Number of samples for which distances are computed at
+            once in "sparse" assignment.
+        warm_start: If True, each clustering after the first one starts from
+            the previous centroids. The clustering must accept the init,
+            n_init and max_iter parameters of KMeans.
+        warm_start_max_iter: Maximum number of iterations of a warm started
+            clustering.
+
+    Out-of-core pools (see cardinal.utils.is_out_of_core) are read
+    sequentially by chunks of chunk_size samples if the clustering supports
+    partial_fit: it is then fitted on successive chunks and the assignment
+    is sparse. Otherwise, such as for KMeans, the pool is loaded in memory.
 
     Attributes:
-        clustering_ : The fitted clustering estimator.
+        clustering: The clustering given by the user, whose parameters are
+            never modified.
+        clustering_ : The fitted clustering estimator. It is clustering
+            itself, or a clone of it when warm started.
     """
-    def __init__(self, clustering, batch_size):
+    def __init__(self, clustering, batch_size, assignment: str = 'exact',
+                 n_candidates: int = None, chunk_size: int = 10000,
+                 warm_start: bool = False, warm_start_max_iter: int = 20):
         super().__init__(batch_size)
+        self.clustering = clustering
         self.clustering_ = clustering
+        self.assignment = assignment
+        self.n_candidates = n_candidates
+        self.chunk_size = chunk_size
+        self.warm_start = warm_start
+        self.warm_start_max_iter = warm_start_max_iter
 
     def fit(self, X, y=None) -> 'KCentroidSampler':
         """Does nothing, this method is unsupervised.
@@ -38,24 +91,119 @@ class KCentroidSampler(BaseQuerySampler):
         """Clusters the samples and select the ones closest to centroids.
         
         Args:
-            X: Pool of unlabeled samples of shape (n_samples, n_features).
+            X: Pool of unlabeled samples of shape (n_samples, n_features),
+                or an ActiveLearningPool.
             sample_weight: Weight of the samples of shape (n_samples),
                 optional.
 
         Returns:
             Indices of the selected samples of shape (batch_size).
         """
+        if isinstance(X, ActiveLearningPool):
+            return self._select_from_pool(X, sample_weight=sample_weight)
+
         if self._not_enough_samples(X):
             return np.arange(X.shape[0])
 
+        if self.assignment not in ('exact', 'sparse'):
+            raise ValueError('Unknown assignment {}'.format(self.assignment))
+
+        if is_out_of_core(X):
+            if hasattr(self.clustering_, 'partial_fit'):
+                with self._stage('clustering', X.shape[0]):
+                    model = self._partial_fit_clustering(
+                        X, sample_weight=sample_weight)
+                with self._stage('assignment', X.shape[0]):
+                    return self._sparse_assignment(model, X)
+            # Other clusterings can only be fitted on the whole pool
+            X = read_rows(X, slice(0, X.shape[0]))
+
+        with self._stage('clustering', X.shape[0]):
+            model = self._fit_clustering(X, sample_weight=sample_weight)
+
+        with self._stage('assignment', X.shape[0]):
+            if self.assignment == 'sparse':
+                return self._sparse_assignment(model, X)
+
+            distances = model.transform(X)
+
+            # Sometimes, one sample can be the closest to two centroids. In
+            # that case, we want to take the second closest one, etc.
+            # linear_sum_assignemnt solves this problem.
+            return linear_sum_assignment(distances)[0]
+
+    def _fit_clustering(self, X: np.array, sample_weight: np.array = None):
         kwargs = dict(sample_weight=sample_weight) if (sample_weight is not None) else dict()
-        model = self.clustering_.fit(X, **kwargs)
-        distances = model.transform(X)
+        model = None
+        if self.warm_start:
+            model = _warm_start_from_centers(
+                self.clustering, self.clustering_, X,
+                self.warm_start_max_iter)
+        self.clustering_ = model if model is not None else self.clustering
+        return self.clustering_.fit(X, **kwargs)
 
-        # Sometimes, one sample can be the closest to two centroids. In that
-        # case, we want to take the second closest one, etc.
-        # linear_sum_assignemnt solves this problem.
-        return linear_sum_assignment(distances)[0]
+    def _partial_fit_clustering(self, X: np.array,
+                                sample_weight: np.array = None):
+        """Fits the clustering with partial_fit on chunks of samples.
+
+        The clustering is reset unless the sampler is warm started. Chunks
+        hold at least batch_size samples, the number of clusters, which the
+        first call to partial_fit requires.
+        """
+        if not hasattr(self.clustering_, 'partial_fit'):
+            raise ValueError(
+                'Clustering {} does not support partial_fit, it cannot be '
+                'fitted by chunks'.format(type(self.clustering_).__name__))
+
+        from sklearn.base import clone
+
+        if not (self.warm_start
+                and hasattr(self.clustering_, 'cluster_centers_')):
+            self.clustering_ = clone(self.clustering)
+        chunk_size = max(self.chunk_size, self.batch_size)
+        for s in chunk_slices(X.shape[0], chunk_size):
+            kwargs = dict(sample_weight=sample_weight[s]) if (sample_weight is not None) else dict()
+            self.clustering_.partial_fit(read_rows(X, s), **kwargs)
+        return self.clustering_
+
+    def _sparse_assignment(self, model, X: np.array) -> np.array:
+        """Solves the assignment on the closest candidates of each centroid.
+
+        If each centroid keeps its batch_size closest samples, an optimal
+        assignment exists among those candidates: a centroid assigned to
+        another sample can always be swapped for one of its candidates not
+        used by the other centroids. The assignment is then exact.
+        """
+        n_candidates = self.n_candidates or self.batch_size
+        n_candidates = min(n_candidates, X.shape[0])
+
+        # Running n_candidates closest samples of each centroid
+        best_distances = np.empty((0, self.batch_size))
+        best_index = np.empty((0, self.batch_size), dtype=np.intp)
+
+        for s in chunk_slices(X.shape[0], self.chunk_size):
+            distances = np.concatenate(
+                [best_distances, model.transform(read_rows(X, s))])
+            index = np.concatenate([best_index, np.broadcast_to(
+                np.arange(s.start, s.stop)[:, None],
+                (s.stop - s.start, self.batch_size))])
+            if distances.shape[0] > n_candidates:
+                kept = np.argpartition(
+                    distances, n_candidates - 1, axis=0)[:n_candidates]
+                distances = np.take_along_axis(distances, kept, axis=0)
+                index = np.take_along_axis(index, kept, axis=0)
+            best_distances, best_index = distances, index
+
+        candidates = np.unique(best_index)
+        if candidates.shape[0] < self.batch_size:
+            # Too few candidates to assign all centroids, we pad them with
+            # the first other samples.
+            others = np.setdiff1d(np.arange(X.shape[0]), candidates)
+            candidates = np.union1d(
+                candidates, others[:self.batch_size - candidates.shape[0]])
+
+        distances = model.transform(read_rows(X, candidates))
+        return candidates[linear_sum_assignment(distances)[0]]
 
 
 class KMeansSampler(KCentroidSampler):
@@ -63,8 +211,19 @@ class KMeansSampler(KCentroidSampler):
 
     Args:
         batch_size: Number of samples to draw when predicting.
+        assignment: See KCentroidSampler.
+        n_candidates: See KCentroidSampler.
+        chunk_size: See KCentroidSampler.
+        warm_start: If True, each clustering after the first one is
+            initialized with the previous centroids and runs at most
+            warm_start_max_iter iterations.
+        warm_start_max_iter: Maximum number of iterations of a warm started
+            clustering.
     """
-    def __init__(self, batch_size, **kmeans_args):
+    def __init__(self, batch_size, assignment: str = 'exact',
+                 n_candidates: int = None, chunk_size: int = 10000,
+                 warm_start: bool = False, warm_start_max_iter: int = 20,
+                 **kmeans_args):
         check_modules('sklearn', 'clustering.KmeansSampler')
         from sklearn.cluster import KMeans
 
@@ -74,7 +233,10 @@ class KMeansSampler(KCentroidSampler):
                 ' This is not supported since n_clusters is overridden using '
                 'batch_size.'.format(kmeans_args['n_clusters']))
         kmeans_args['n_clusters'] = batch_size
-        super().__init__(KMeans(**kmeans_args), batch_size)
+        super().__init__(KMeans(**kmeans_args), batch_size,
+                         assignment=assignment, n_candidates=n_candidates,
+                         chunk_size=chunk_size, warm_start=warm_start,
+                         warm_start_max_iter=warm_start_max_iter)
 
 
 class MiniBatchKMeansSampler(KCentroidSampler):
@@ -82,8 +244,23 @@ class MiniBatchKMeansSampler(KCentroidSampler):
 
     Args:
         batch_size: Number of samples to draw when predicting.
+        assignment: See KCentroidSampler.
+        n_candidates: See KCentroidSampler.
+        chunk_size: See KCentroidSampler. Also the size of the chunks given
+            to partial_fit in incremental mode, raised to batch_size if
+            lower.
+        warm_start: If True, each clustering after the first one starts from
+            the previous centroids.
+        warm_start_max_iter: Maximum number of iterations of a warm started
+            clustering. Not used in incremental mode.
+        incremental: If True, the clustering is fitted with partial_fit on
+            successive chunks of the pool. Combined with warm_start, the
+            centroids are updated with a single pass over the pool.
     """
-    def __init__(self, batch_size, **kmeans_args):
+    def __init__(self, batch_size, assignment: str = 'exact',
+                 n_candidates: int = None, chunk_size: int = 10000,
+                 warm_start: bool = False, warm_start_max_iter: int = 20,
+                 incremental: bool = False, **kmeans_args):
         check_modules('sklearn', 'clustering.MiniBatchKmeansSampler')
         from sklearn.cluster import MiniBatchKMeans
 
@@ -94,4 +271,13 @@ class MiniBatchKMeansSampler(KCentroidSampler):
                 'n_clusters is overridden using '
                 'batch_size.'.format(kmeans_args['n_clusters']))
         kmeans_args['n_clusters'] = batch_size
-        super().__init__(MiniBatchKMeans(**kmeans_args), batch_size)
+        super().__init__(MiniBatchKMeans(**kmeans_args), batch_size,
+                         assignment=assignment, n_candidates=n_candidates,
+                         chunk_size=chunk_size, warm_start=warm_start,
+                         warm_start_max_iter=warm_start_max_iter)
+        self.incremental = incremental
+
+    def _fit_clustering(self, X: np.array, sample_weight: np.array = None):
+        if not self.incremental:
+            return super()._fit_clustering(X, sample_weight=sample_weight)
+        return self._partial_fit_clustering(X, sample_weight=sample_weight)
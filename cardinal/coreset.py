@@ -0,0 +1,159 @@
+import numpy as np
+from scipy import sparse
+
+from .version import check_modules
+check_modules('sklearn', 'coreset')  # noqa
+
+from sklearn.metrics import pairwise_distances, pairwise_distances_argmin_min
+
+from .base import BaseQuerySampler
+from .pool import ActiveLearningPool
+from .typeutils import RandomStateType, check_random_state
+from .utils import (chunk_slices, is_out_of_core, read_rows,
+                    DEFAULT_CHUNK_SIZE)
+
+
+class CoresetSampler(BaseQuerySampler):
+    """Selects samples using the k-center greedy algorithm.
+
+    Samples are selected one at a time as the furthest one from the labeled
+    and already selected samples. The distance of each sample to its closest
+    center is kept in a vector updated after each pick with the distances to
+    the new center only, so the selection takes O(n_samples * batch_size)
+    distance computations. The pool is processed by blocks of chunk_size
+    rows, which allows out-of-core and sparse pools. It is projected or cast
+    to dtype once, except out-of-core pools without projection, which are
+    read at each pick and never loaded entirely in memory.
+
+    Sener, O., & Savarese, S. (2018). Active Learning for Convolutional
+    Neural Networks: A Core-Set Approach. ICLR.
+
+    Args:
+        batch_size: Number of samples to select.
+        metric: Metric to use for distance computation.
+        dtype: Dtype in which blocks of samples and distances are processed.
+            float32 halves the memory used compared to float64.
+        n_components: If specified, samples are first projected on
+            n_components random gaussian directions, which approximately
+            preserves euclidean distances and makes distance computations
+            cheaper on high dimensional embeddings. Requires the euclidean
+            metric.
+        chunk_size: Number of samples processed at once.
+        random_state: Random seeding of the projection and of the first
+            center when no sample is labeled.
+
+    Attributes:
+        components_: The random projection, if n_components is specified.
+        min_distances_: Distance of each sample of the last pool to its
+            closest center after the selection.
+    """
+    def __init__(self, batch_size: int, metric: str = 'euclidean',
+                 dtype=np.float32, n_components: int = None,
+                 chunk_size: int = DEFAULT_CHUNK_SIZE,
+                 random_state: RandomStateType = None):
+        super().__init__(batch_size)
+        if n_components is not None and metric != 'euclidean':
+            raise ValueError('Random projection only supports the euclidean '
+                             'metric, got {}'.format(metric))
+        self.metric = metric
+        self.dtype = dtype
+        self.n_components = n_components
+        self.chunk_size = chunk_size
+        self.random_state = random_state
+
+    def _transform(self, X: np.array) -> np.array:
+        """Projects a block of samples and casts it to dtype."""
+        if self.n_components is not None:
+            X = X @ self.components_
+        if sparse.issparse(X):
+            return X.astype(self.dtype)
+        return np.asarray(X).astype(self.dtype, copy=False)
+
+    def fit(self, X: np.array, y: np.array = None) -> 'CoresetSampler':
+        """Stores the labeled samples, used as initial centers.
+
+        Args:
+            X: Labeled samples of shape (n_samples, n_features).
+            y: Labels of shape (n_samples).
+
+        Returns:
+            The object itself
+        """
+        self.random_state = check_random_state(self.random_state)
+        if self.n_components is not None:
+            with self._stage('projection', X.shape[0]):
+                self.components_ = self.random_state.normal(
+                    size=(X.shape[1], self.n_components)).astype(self.dtype)
+                self.components_ /= np.sqrt(self.n_components)
+        self.centers_ = self._transform(X) if X.shape[0] > 0 else None
+        return self
+
+    def select_samples(self, X: np.array) -> np.array:
+        """Selects the samples furthest from the labeled ones, greedily.
+
+        Args:
+            X: Pool of unlabeled samples of shape (n_samples, n_features),
+                or an ActiveLearningPool.
+
+        Returns:
+            Indices of the selected samples of shape (batch_size).
+        """
+        if isinstance(X, ActiveLearningPool):
+            return self._select_from_pool(X)
+
+        if self._not_enough_samples(X):
+            return np.arange(X.shape[0])
+
+        n_samples = X.shape[0]
+        slices = list(chunk_slices(n_samples, self.chunk_size))
+
+        # Only unprojected out-of-core pools are read again at each pick
+        read_each_pick = self.n_components is None and is_out_of_core(X)
+        if self.n_components is not None:
+            # The projection is small enough to be computed once, by blocks
+            with self._stage('projection', n_samples):
+                X_projected = np.empty((n_samples, self.n_components),
+                                       dtype=self.dtype)
+                for s in slices:
+                    X_projected[s] = self._transform(read_rows(X, s))
+            X = X_projected
+        elif not read_each_pick:
+            X = self._transform(X)
+
+        def get_block(s):
+            block = read_rows(X, s)
+            return self._transform(block) if read_each_pick else block
+
+        min_distances = np.full(n_samples, np.inf, dtype=self.dtype)
+        centers = getattr(self, 'centers_', None)
+        if centers is not None:
+            with self._stage('init', n_samples):
+                for s in slices:
+                    min_distances[s] = pairwise_distances_argmin_min(
+                        get_block(s), centers, metric=self.metric)[1]
+
+        with self._stage('greedy', n_samples):
+            selected = []
+            for _ in range(self.batch_size):
+                if selected or centers is not None:
+                    idx = int(np.argmax(min_distances))
+                else:
+                    # Without labeled samples, the first center is random
+                    self.random_state = check_random_state(
+                        self.random_state)
+                    # Drawn the same way for RandomState and Generator
+                    idx = int(self.random_state.random() * n_samples)
+                selected.append(idx)
+
+                # Update the distances with the new center only
+                center = get_block(slice(idx, idx + 1))
+                for s in slices:
+                    distances = pairwise_distances(
+                        get_block(s), center, metric=self.metric)[:, 0]
+                    np.minimum(min_distances[s], distances,
+                               out=min_distances[s])
+                # Selected samples are never picked again
+                min_distances[idx] = -1
+
+        self.min_distances_ = min_distances
+        return np.asarray(selected)
@@ -0,0 +1,305 @@
+import os
+import pickle
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import Callable, Dict, Iterable, List
+
+import numpy as np
+
+from .version import check_modules
+
+check_modules('sklearn', 'experiment')  # noqa
+
+from sklearn.model_selection import train_test_split
+
+from .pool import ActiveLearningPool
+from .utils import effective_n_jobs
+
+
+def _to_bytes(obj) -> np.array:
+    return np.frombuffer(pickle.dumps(obj, protocol=pickle.HIGHEST_PROTOCOL),
+                         dtype=np.uint8)
+
+
+def save_checkpoint(path: str, iteration: int, labeled_mask: np.array,
+                    results: Dict[str, list], sampler, monitors=None):
+    """Saves the state of an active learning loop in a .npz file.
+
+    Arrays are stored as such and the labeled mask as bits, so that the file
+    stays compact. The sampler, which holds its random state and fitted
+    estimators such as KMeans centroids, and the monitors are pickled. The
+    file is written next to path then renamed, so that a crash while saving
+    leaves the previous checkpoint intact.
+
+    Args:
+        path: Path of the checkpoint.
+        iteration: Number of completed iterations.
+        labeled_mask: Boolean mask of labeled samples.
+        results: Results of the loop so far. "selected" is the list of
+            indices selected at each iteration, other values are lists of
+            numbers.
+        sampler: The query sampler.
+        monitors: Monitors fed along the loop.
+    """
+    selected = results.get('selected', [])
+    arrays = {
+        'iteration': np.array(iteration),
+        'n_samples': np.array(labeled_mask.shape[0]),
+        'labeled_mask': np.packbits(labeled_mask),
+        'selected': np.concatenate(selected) if selected
+        else np.zeros(0, dtype=int),
+        'selected_sizes': np.array([len(s) for s in selected], dtype=int),
+        'sampler': _to_bytes(sampler),
+        'monitors': _to_bytes(monitors),
+    }
+    for key, values in results.items():
+        if key != 'selected':
+            arrays['results_' + key] = np.array(values)
+
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        np.savez(f, **arrays)
+    os.replace(tmp_path, path)
+
+
+def load_checkpoint(path: str) -> dict:
+    """Loads a checkpoint written by save_checkpoint.
+
+    Args:
+        path: Path of the checkpoint.
+
+    Returns:
+        A dictionary with keys iteration, labeled_mask, results, sampler and
+        monitors, matching the arguments of save_checkpoint.
+    """
+    with np.load(path) as data:
+        n_samples = int(data['n_samples'])
+        sizes = np.cumsum(data['selected_sizes'])[:-1]
+        results = {'selected': np.split(data['selected'], sizes)
+                   if data['selected_sizes'].shape[0] else []}
+        for key in data.files:
+            if key.startswith('results_'):
+                results[key[len('results_'):]] = data[key].tolist()
+        return {
+            'iteration': int(data['iteration']),
+            'labeled_mask': np.unpackbits(
+                data['labeled_mask'], count=n_samples).astype(bool),
+            'results': results,
+            'sampler': pickle.loads(data['sampler'].tobytes()),
+            'monitors': pickle.loads(data['monitors'].tobytes()),
+        }
+
+
+def active_learning_loop(sampler, model, X_train: np.array,
+                         y_train: np.array, X_test: np.array,
+                         y_test: np.array, labeled: np.array,
+                         n_iter: int, monitors: list = None,
+                         checkpoint: str = None) -> Dict[str, list]:
+    """Simulates an active learning experiment.
+
+    At each iteration, the model is trained on labeled samples and evaluated
+    on the test set, then the sampler selects the next samples to label.
+
+    If a checkpoint path is given, the state of the loop is saved there after
+    each iteration. If the checkpoint already exists, the loop resumes from
+    the last completed iteration, using the sampler and monitors stored in
+    the checkpoint instead of the ones given.
+
+    Args:
+        sampler: The query sampler.
+        model: The model to train, with fit and score methods.
+        X_train: Samples of the pool of shape (n_samples, n_features).
+        y_train: Labels of the pool of shape (n_samples).
+        X_test: Test samples.
+        y_test: Test labels.
+        labeled: Indices of the initially labeled samples.
+        n_iter: Number of iterations.
+        monitors: Monitors whose accumulate method is called with the number
+            of labeled samples and the predicted probabilities on the test
+            set at each iteration, such as ContradictionMonitor.
+        checkpoint: Path of the checkpoint file, optional.
+
+    Returns:
+        A dictionary with the number of labeled samples, the accuracy of the
+        model and the indices selected at each iteration.
+    """
+    pool = ActiveLearningPool(X_train, y_train, labeled=labeled)
+    results = {'n_labeled': [], 'accuracy': [], 'selected': []}
+    monitors = monitors or []
+    start = 0
+
+    if checkpoint is not None and os.path.exists(checkpoint):
+        state = load_checkpoint(checkpoint)
+        pool.label(np.flatnonzero(state['labeled_mask']))
+        results, sampler = state['results'], state['sampler']
+        monitors, start = state['monitors'], state['iteration']
+
+    for i in range(start, n_iter):
+        X_labeled, y_labeled = pool.get_labeled()
+        model.fit(X_labeled, y_labeled)
+
+        results['n_labeled'].append(pool.n_labeled)
+        results['accuracy'].append(model.score(X_test, y_test))
+        if monitors:
+            probas_test = model.predict_proba(X_test)
+            for monitor in monitors:
+                monitor.accumulate(pool.n_labeled, probas_test)
+
+        sampler.fit(X_labeled, y_labeled)
+        selected = sampler.select_samples(pool)
+        pool.label(selected)
+        results['selected'].append(selected)
+
+        if checkpoint is not None:
+            save_checkpoint(checkpoint, i + 1, pool.labeled_mask, results,
+                            sampler, monitors)
+
+    return results
+
+
+# Data of the experiment in worker processes, set by _init_worker
+_DATA = {}
+
+
+def _share_array(array: np.array):
+    """Copies an array in shared memory.
+
+    Returns:
+        The shared memory block and the description needed to attach it.
+    """
+    shm = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+    shared = np.ndarray(array.shape, dtype=array.dtype, buffer=shm.buf)
+    shared[...] = array
+    return shm, (shm.name, array.shape, array.dtype.str)
+
+
+def _init_worker(X_spec, y_spec):
+    for key, spec in (('X', X_spec), ('y', y_spec)):
+        if isinstance(spec, tuple):
+            name, shape, dtype = spec
+            shm = shared_memory.SharedMemory(name=name)
+            _DATA[key + '_shm'] = shm
+            spec = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+        _DATA[key] = spec
+
+
+def _run_one(name: str, sampler_factory: Callable, model_factory: Callable,
+             seed: int, n_iter: int, test_size,
+             checkpoint_dir: str = None) -> List[dict]:
+    X, y = _DATA['X'], _DATA['y']
+    X_train, X_test, y_train, y_test = train_test_split(
+        X, y, test_size=test_size, random_state=seed)
+
+    # We start with one sample of each class
+    _, labeled = np.unique(y_train, return_index=True)
+
+    checkpoint = None
+    if checkpoint_dir is not None:
+        checkpoint = os.path.join(
+            checkpoint_dir, '{}_{}.npz'.format(name, seed))
+
+    results = active_learning_loop(
+        sampler_factory(seed), model_factory(seed), X_train, y_train,
+        X_test, y_test, labeled, n_iter, checkpoint=checkpoint)
+
+    return [
+        {'sampler': name, 'seed': seed, 'iteration': i,
+         'n_labeled': n_labeled, 'accuracy': accuracy}
+        for i, (n_labeled, accuracy) in enumerate(
+            zip(results['n_labeled'], results['accuracy']))]
+
+
+def run_experiments(X: np.array, y: np.array,
+                    samplers: Dict[str, Callable], model_factory: Callable,
+                    seeds: Iterable[int], n_iter: int, test_size=0.25,
+                    n_jobs: int = 1,
+                    checkpoint_dir: str = None) -> List[dict]:
+    """Runs active learning experiments for several samplers and seeds.
+
+    Each (sampler, seed) experiment splits the data in a pool and a test set
+    using the seed, starts with one labeled sample per class and runs
+    active_learning_loop. Experiments run in a process pool. X and y are
+    copied once in shared memory and are not pickled for each experiment.
+
+    Args:
+        X: Samples of shape (n_samples, n_features).
+        y: Labels of shape (n_samples).
+        samplers: Mapping from sampler names to factories taking a seed and
+            returning a new sampler. Factories must be picklable when n_jobs
+            is not 1, e.g. module level functions or functools.partial.
+        model_factory: Function taking a seed and returning a new model.
+        seeds: Seeds of the experiments.
+        n_iter: Number of iterations of each experiment.
+        test_size: Size of the test set, see train_test_split.
+        n_jobs: Number of processes. -1 means using all cores.
+        checkpoint_dir: If specified, each experiment is checkpointed in
+            this directory and interrupted experiments are resumed when
+            calling run_experiments again.
+
+    Returns:
+        A list of records, one per sampler, seed and iteration, with keys
+        sampler, seed, iteration, n_labeled and accuracy. See
+        results_to_curves to plot them.
+    """
+    tasks = [(name, factory, model_factory, seed, n_iter, test_size,
+              checkpoint_dir)
+             for name, factory in samplers.items() for seed in seeds]
+    n_jobs = effective_n_jobs(n_jobs)
+
+    if n_jobs == 1:
+        _init_worker(X, y)
+        try:
+            results = [_run_one(*task) for task in tasks]
+        finally:
+            _DATA.clear()
+        return [record for result in results for record in result]
+
+    blocks, specs = [], []
+    try:
+        for array in (X, y):
+            if isinstance(array, np.ndarray) and array.dtype != object:
+                shm, spec = _share_array(np.ascontiguousarray(array))
+                blocks.append(shm)
+                specs.append(spec)
+            else:
+                # Sparse matrices, lists... are pickled once per worker
+                specs.append(array)
+
+        with ProcessPoolExecutor(n_jobs, initializer=_init_worker,
+                                 initargs=tuple(specs)) as executor:
+            futures = [executor.submit(_run_one, *task) for task in tasks]
+            results = [future.result() for future in futures]
+    finally:
+        for shm in blocks:
+            shm.close()
+            shm.unlink()
+
+    return [record for result in results for record in result]
+
+
+def results_to_curves(records: List[dict],
+                      metric: str = 'accuracy') -> Dict[str, tuple]:
+    """Groups experiment records by sampler for plot_confidence_interval.
+
+    Args:
+        records: Records returned by run_experiments.
+        metric: Name of the metric to extract.
+
+    Returns:
+        A dictionary mapping sampler names to (x, values) where x is the
+        average number of labeled samples at each iteration and values is of
+        shape (n_seeds, n_iter), so that plot_confidence_interval(x, values)
+        plots the curve of the sampler.
+    """
+    curves = {}
+    for name in dict.fromkeys(record['sampler'] for record in records):
+        runs = {}
+        for record in records:
+            if record['sampler'] == name:
+                runs.setdefault(record['seed'], []).append(record)
+        runs = [sorted(run, key=lambda r: r['iteration'])
+                for run in runs.values()]
+        x = np.mean([[r['n_labeled'] for r in run] for run in runs], axis=0)
+        values = np.array([[r[metric] for r in run] for run in runs])
+        curves[name] = (x, values)
+    return curves
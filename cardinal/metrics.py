@@ -1,8 +1,12 @@
 import logging
+import os
 from abc import ABC, abstractmethod
 
 import numpy as np
 
+from .utils import chunk_slices, read_rows, DEFAULT_CHUNK_SIZE
+from .version import check_modules
+
 
 class BaseMonitor(ABC):
     """A monitor is a metric and a set of utils to record it and monitor it.
@@ -52,25 +56,172 @@ class BaseMonitor(ABC):
         return True
         
 
-class ContradictionMonitor(BaseMonitor):
+def _iter_prediction_chunks(probas_test, chunk_size: int):
+    """Iterates over predictions given as an array or as chunks.
+
+    Returns:
+        A generator of (rows, chunk) where rows is the slice of test samples
+        covered by the chunk.
+    """
+    if isinstance(probas_test, np.ndarray):
+        chunks = (probas_test[s] for s in chunk_slices(
+            probas_test.shape[0], chunk_size))
+    else:
+        chunks = probas_test
+    offset = 0
+    for chunk in chunks:
+        chunk = np.asarray(chunk)
+        rows = slice(offset, offset + chunk.shape[0])
+        yield rows, chunk
+        offset = rows.stop
+
+
+class BasePredictionMonitor(BaseMonitor):
+    """Monitor computed from the predictions of the model on a test set.
+
+    Predictions are processed by chunks of test samples. They can be given as
+    an array of shape (n_test, n_classes) or as an iterable of chunks, for
+    test sets too large to be predicted at once. A MonitorSet feeds the
+    chunks of a single inference pass to several such monitors.
+
+    Args:
+        batch_size: If specified, a warning will be issued if batch_size is
+            not correct
+        tolerance: Tolerance used by is_stalled
+        chunk_size: Number of test samples processed at once.
+    """
+
+    # Whether _update needs the predicted classes
+    _needs_predictions = False
+
+    def __init__(self, batch_size=None, tolerance=None,
+                 chunk_size: int = DEFAULT_CHUNK_SIZE):
+        self.chunk_size = chunk_size
+        super().__init__(batch_size=batch_size, tolerance=tolerance)
+
+    def _start(self, probas_test):
+        """Prepares a new iteration.
+
+        Args:
+            probas_test: The predictions given for this iteration.
+        """
+        pass
+
+    @abstractmethod
+    def _update(self, rows: slice, probas: np.array, predictions: np.array):
+        """Processes a chunk of predictions.
+
+        Args:
+            rows: Slice of the test samples covered by the chunk.
+            probas: Predicted probabilities of shape (n_rows, n_classes).
+            predictions: Indices of the predicted classes, or None if
+                _needs_predictions is False.
+        """
+        pass
+
+    @abstractmethod
+    def _finish(self, probas_test):
+        """Ends an iteration.
+
+        Returns:
+            The value of the metric for this iteration, or None if there is
+            none, for example at the first iteration of a difference.
+        """
+        pass
+
+    def _record(self, n_samples: int, value):
+        if value is not None:
+            self.values.append(value)
+            self._append_n_samples(n_samples)
+
+    """Stores the metric for a new iteration.
+
+    Args:
+        n_samples : Number of training samples
+        probas_test : Predictions of shape (n_test, n_classes), or an
+            iterable of chunks of predictions given in the same order at
+            each iteration
+    """
+    def accumulate(self, n_samples: int, probas_test):
+        self._start(probas_test)
+        for rows, chunk in _iter_prediction_chunks(probas_test,
+                                                   self.chunk_size):
+            predictions = (chunk.argmax(axis=1)
+                           if self._needs_predictions else None)
+            self._update(rows, chunk, predictions)
+        self._record(n_samples, self._finish(probas_test))
+
+
+class ContradictionMonitor(BasePredictionMonitor):
     """Stores the amount of contradictions along an experiment
 
     We call contradiction the difference between predictions of two successive
     models on an isolated test set.
-    """
 
-    """Stores contradiction for a new iteration.
+    Predictions are processed by chunks of test samples so that no temporary
+    array of the size of the test set is allocated. Previous predictions can
+    be stored with a smaller dtype or in a memory-mapped file, and are then
+    updated in place.
 
     Args:
-        n_samples : Number of training samples
-        probas_test : Predictions of shape (n_samples, n_classes)
+        batch_size: If specified, a warning will be issued if batch_size is
+            not correct
+        tolerance: Tolerance used by is_stalled
+        dtype: If specified, a copy of previous predictions is stored with
+            this dtype, e.g. np.float32. Otherwise, a reference to the given
+            predictions is kept when they are given as an array.
+        memmap_path: If specified, previous predictions are stored in a
+            memory-mapped file at this path.
+        chunk_size: Number of test samples processed at once.
     """
-    def accumulate(self, n_samples: int, probas_test: np.array):
+    def __init__(self, batch_size=None, tolerance=None, dtype=None,
+                 memmap_path: str = None,
+                 chunk_size: int = DEFAULT_CHUNK_SIZE):
+        self.dtype = dtype
+        self.memmap_path = memmap_path
+        super().__init__(batch_size=batch_size, tolerance=tolerance,
+                         chunk_size=chunk_size)
+
+    def _start(self, probas_test):
+        self._keep_reference = (isinstance(probas_test, np.ndarray)
+                                and self.dtype is None
+                                and self.memmap_path is None)
+        self._in_place = (self.last_probas_test is not None
+                          and self._owns_last_probas
+                          and not self._keep_reference)
+        self._writer = None
+        if not self._keep_reference and not self._in_place:
+            # The size of the copy is known if predictions are an array
+            shape = (probas_test.shape
+                     if isinstance(probas_test, np.ndarray) else None)
+            self._writer = _PredictionWriter(self.dtype, self.memmap_path,
+                                             shape=shape)
+        self._contradiction = 0.
+
+    def _update(self, rows: slice, probas: np.array, predictions: np.array):
+        last = self.last_probas_test
+        if last is not None:
+            diff = probas - last[rows]
+            self._contradiction += np.abs(diff, out=diff).sum()
+        if self._in_place:
+            last[rows] = probas
+        elif self._writer is not None:
+            self._writer.write(probas)
+
+    def _finish(self, probas_test):
+        value = None
         if self.last_probas_test is not None:
-            self.values.append(
-                np.abs(probas_test - self.last_probas_test).sum())
-            self._append_n_samples(n_samples)
-        self.last_probas_test = probas_test
+            value = self._contradiction
+        if self._keep_reference:
+            self.last_probas_test = probas_test
+            self._owns_last_probas = False
+        elif self._writer is not None:
+            # Release the previous memmap before overwriting its file
+            self.last_probas_test = None
+            self.last_probas_test = self._writer.close()
+            self._owns_last_probas = True
+        self._writer = None
+        return value
 
     """Returns the recorded metrics
     """
@@ -85,3 +236,325 @@ class ContradictionMonitor(BaseMonitor):
     def reset(self):
         super().reset()
         self.last_probas_test = None
+        self._owns_last_probas = False
+        self._writer = None
+
+
+class AccuracyMonitor(BasePredictionMonitor):
+    """Stores the accuracy of the model on a labeled test set
+
+    Args:
+        y_test: Labels of the test set.
+        classes: Labels corresponding to the columns of the predictions,
+            e.g. model.classes_. By default, the labels are the column
+            indices.
+        batch_size: If specified, a warning will be issued if batch_size is
+            not correct
+        tolerance: Tolerance used by is_stalled
+        chunk_size: Number of test samples processed at once.
+    """
+    _needs_predictions = True
+
+    def __init__(self, y_test: np.array, classes: np.array = None,
+                 batch_size=None, tolerance=None,
+                 chunk_size: int = DEFAULT_CHUNK_SIZE):
+        self.y_test = np.asarray(y_test)
+        self.classes = classes
+        super().__init__(batch_size=batch_size, tolerance=tolerance,
+                         chunk_size=chunk_size)
+
+    def _start(self, probas_test):
+        self._n_correct = 0
+
+    def _update(self, rows: slice, probas: np.array, predictions: np.array):
+        if self.classes is not None:
+            predictions = np.asarray(self.classes)[predictions]
+        self._n_correct += np.count_nonzero(predictions == self.y_test[rows])
+
+    def _finish(self, probas_test):
+        return self._n_correct / self.y_test.shape[0]
+
+    def get(self):
+        return {
+            "n_samples": self.n_samples,
+            "accuracies": self.values
+        }
+
+
+class ConfidenceDriftMonitor(BasePredictionMonitor):
+    """Stores the drift of the confidence of the model along an experiment
+
+    The confidence of the model is its mean highest predicted probability on
+    the test set. The drift is its difference between two successive models.
+
+    Args:
+        batch_size: If specified, a warning will be issued if batch_size is
+            not correct
+        tolerance: Tolerance used by is_stalled
+        chunk_size: Number of test samples processed at once.
+
+    Attributes:
+        confidences: Mean confidence at each iteration.
+    """
+    def _start(self, probas_test):
+        self._confidence_sum = 0.
+        self._n_test = 0
+
+    def _update(self, rows: slice, probas: np.array, predictions: np.array):
+        self._confidence_sum += probas.max(axis=1).sum()
+        self._n_test += probas.shape[0]
+
+    def _finish(self, probas_test):
+        self.confidences.append(self._confidence_sum / self._n_test)
+        if len(self.confidences) < 2:
+            return None
+        return self.confidences[-1] - self.confidences[-2]
+
+    def get(self):
+        return {
+            "n_samples": self.n_samples,
+            "confidence_drifts": self.values,
+            "confidences": self.confidences
+        }
+
+    def reset(self):
+        super().reset()
+        self.confidences = []
+
+
+class LabelDistributionMonitor(BasePredictionMonitor):
+    """Stores the distribution of the labels predicted on the test set
+
+    The recorded value is the total variation distance between the predicted
+    label distributions of two successive models.
+
+    Args:
+        n_classes: Number of classes.
+        batch_size: If specified, a warning will be issued if batch_size is
+            not correct
+        tolerance: Tolerance used by is_stalled
+        chunk_size: Number of test samples processed at once.
+
+    Attributes:
+        distributions: Proportion of test samples predicted in each class at
+            each iteration.
+    """
+    _needs_predictions = True
+
+    def __init__(self, n_classes: int, batch_size=None, tolerance=None,
+                 chunk_size: int = DEFAULT_CHUNK_SIZE):
+        self.n_classes = n_classes
+        super().__init__(batch_size=batch_size, tolerance=tolerance,
+                         chunk_size=chunk_size)
+
+    def _start(self, probas_test):
+        self._counts = np.zeros(self.n_classes, dtype=int)
+
+    def _update(self, rows: slice, probas: np.array, predictions: np.array):
+        self._counts += np.bincount(predictions, minlength=self.n_classes)
+
+    def _finish(self, probas_test):
+        self.distributions.append(self._counts / self._counts.sum())
+        if len(self.distributions) < 2:
+            return None
+        return .5 * np.abs(self.distributions[-1]
+                           - self.distributions[-2]).sum()
+
+    def get(self):
+        return {
+            "n_samples": self.n_samples,
+            "distances": self.values,
+            "distributions": self.distributions
+        }
+
+    def reset(self):
+        super().reset()
+        self.distributions = []
+
+
+class ExplorationMonitor(BaseMonitor):
+    """Stores how well the test set is explored by labeled samples
+
+    Two exploration scores are recorded: the mean distance between labeled
+    samples and test samples, and the mean distance of test samples to their
+    nearest labeled sample. Each call to accumulate gives the newly labeled
+    samples only. Their distances to the test set are computed by blocks of
+    block_size x block_size and reduced into a running sum and a running
+    minimum per test sample, so the cost of an iteration only depends on
+    the batch size and at most one block is allocated.
+
+    Args:
+        X_test: Test samples of shape (n_test, n_features). Can be an
+            out-of-core array, see cardinal.utils.is_out_of_core.
+        metric: Metric to use for distance computation.
+        block_size: Number of samples per block, for both labeled and test
+            samples.
+        batch_size: If specified, a warning will be issued if batch_size is
+            not correct
+        tolerance: Tolerance used by is_stalled
+
+    Attributes:
+        min_distances_: Distance of each test sample to its nearest labeled
+            sample.
+        min_values: Mean of min_distances_ at each iteration.
+    """
+    def __init__(self, X_test: np.array, metric: str = 'euclidean',
+                 block_size: int = 1024, batch_size=None, tolerance=None):
+        self.X_test = X_test
+        self.metric = metric
+        self.block_size = block_size
+        super().__init__(batch_size=batch_size, tolerance=tolerance)
+
+    """Stores exploration for a new iteration.
+
+    Args:
+        n_samples : Number of training samples
+        X_selected : Samples labeled since the last call
+    """
+    def accumulate(self, n_samples: int, X_selected: np.array):
+        check_modules('sklearn', 'metrics')
+        from sklearn.metrics import pairwise_distances
+
+        n_test = self.X_test.shape[0]
+        if self.min_distances_ is None:
+            self.min_distances_ = np.full(n_test, np.inf)
+
+        for test_rows in chunk_slices(n_test, self.block_size):
+            X_test_block = read_rows(self.X_test, test_rows)
+            min_distances = self.min_distances_[test_rows]
+            for rows in chunk_slices(X_selected.shape[0], self.block_size):
+                block = pairwise_distances(read_rows(X_selected, rows),
+                                           X_test_block, metric=self.metric)
+                self._distance_sum += block.sum()
+                np.minimum(min_distances, block.min(axis=0),
+                           out=min_distances)
+        self._n_labeled += X_selected.shape[0]
+
+        if self._n_labeled == 0:
+            return
+        self.values.append(self._distance_sum / (self._n_labeled * n_test))
+        self.min_values.append(self.min_distances_.mean())
+        self._append_n_samples(n_samples)
+
+    def get(self):
+        return {
+            "n_samples": self.n_samples,
+            "explorations": self.values,
+            "min_explorations": self.min_values
+        }
+
+    def reset(self):
+        super().reset()
+        self.min_values = []
+        self.min_distances_ = None
+        self._distance_sum = 0.
+        self._n_labeled = 0
+
+
+class MonitorSet:
+    """Feeds several monitors from a single inference pass per iteration.
+
+    Predictions on the test set are read once, by chunks, and each chunk is
+    given to all the prediction monitors. Predicted classes are computed
+    once per chunk for the monitors that need them. Monitors that are not
+    based on predictions, such as ExplorationMonitor, are given the newly
+    labeled samples.
+
+    Args:
+        monitors: Mapping from names to monitors.
+        chunk_size: Number of test samples processed at once.
+    """
+    def __init__(self, monitors: dict, chunk_size: int = DEFAULT_CHUNK_SIZE):
+        self.monitors = monitors
+        self.chunk_size = chunk_size
+
+    def __getitem__(self, name: str) -> BaseMonitor:
+        return self.monitors[name]
+
+    def accumulate(self, n_samples: int, probas_test, X_selected=None):
+        """Stores all metrics for a new iteration.
+
+        Args:
+            n_samples: Number of training samples.
+            probas_test: Predictions of shape (n_test, n_classes), or an
+                iterable of chunks of predictions.
+            X_selected: Samples labeled since the last call, given to the
+                monitors not based on predictions. They are skipped if
+                X_selected is None.
+        """
+        prediction_monitors = [
+            monitor for monitor in self.monitors.values()
+            if isinstance(monitor, BasePredictionMonitor)]
+        needs_predictions = any(monitor._needs_predictions
+                                for monitor in prediction_monitors)
+
+        for monitor in prediction_monitors:
+            monitor._start(probas_test)
+        for rows, chunk in _iter_prediction_chunks(probas_test,
+                                                   self.chunk_size):
+            predictions = chunk.argmax(axis=1) if needs_predictions else None
+            for monitor in prediction_monitors:
+                monitor._update(rows, chunk, predictions)
+        for monitor in prediction_monitors:
+            monitor._record(n_samples, monitor._finish(probas_test))
+
+        if X_selected is None:
+            return
+        for monitor in self.monitors.values():
+            if not isinstance(monitor, BasePredictionMonitor):
+                monitor.accumulate(n_samples, X_selected)
+
+    def get(self) -> dict:
+        """Returns the recorded metrics of each monitor by name."""
+        return {name: monitor.get() for name, monitor in self.monitors.items()}
+
+    def reset(self):
+        """Reset the metrics for a new experiment"""
+        for monitor in self.monitors.values():
+            monitor.reset()
+
+
+class _PredictionWriter:
+    """Copies chunks of predictions into an array or a memory-mapped file.
+
+    If the shape of the predictions is known, chunks are written into a
+    preallocated array. Otherwise, they are concatenated when closing.
+    """
+    def __init__(self, dtype=None, memmap_path: str = None,
+                 shape: tuple = None):
+        self.dtype = dtype
+        self.memmap_path = memmap_path
+        self.chunks = []
+        self.file = None if memmap_path is None else open(
+            memmap_path + '.tmp', 'wb')
+        self.array = None
+        if self.file is None and shape is not None:
+            self.array = np.empty(shape, dtype=dtype)
+        self.n_rows = 0
+        self.row_shape = None
+        self.chunk_dtype = None
+
+    def write(self, chunk: np.array):
+        if self.array is not None:
+            # Cast while copying, without a temporary chunk
+            self.array[self.n_rows:self.n_rows + chunk.shape[0]] = chunk
+            self.n_rows += chunk.shape[0]
+            return
+        chunk = chunk.astype(self.dtype or chunk.dtype, copy=False)
+        self.n_rows += chunk.shape[0]
+        self.row_shape = chunk.shape[1:]
+        self.chunk_dtype = chunk.dtype
+        if self.file is not None:
+            chunk.tofile(self.file)
+        else:
+            self.chunks.append(chunk)
+
+    def close(self) -> np.array:
+        if self.array is not None:
+            return self.array
+        if self.file is None:
+            return np.concatenate(self.chunks)
+        self.file.close()
+        os.replace(self.memmap_path + '.tmp', self.memmap_path)
+        return np.memmap(self.memmap_path, dtype=self.chunk_dtype, mode='r+',
+                         shape=(self.n_rows,) + tuple(self.row_shape))
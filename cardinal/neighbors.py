@@ -0,0 +1,213 @@
+from abc import ABC, abstractmethod
+
+import numpy as np
+from scipy import sparse
+
+from .version import check_modules
+check_modules('sklearn', 'neighbors')  # noqa
+
+from sklearn.metrics import pairwise_distances_argmin_min
+from sklearn.neighbors import BallTree, KDTree
+
+from .typeutils import RandomStateType, check_random_state
+
+
+class BaseNeighborIndex(ABC):
+    """Abstract Base Class for indices giving the distance to the nearest
+    indexed sample.
+
+    Indices are built once on labeled samples and updated as new samples get
+    labeled, so that querying them does not become slower along iterations.
+
+    Args:
+        metric: Metric to use for distance computation.
+    """
+    def __init__(self, metric: str = 'euclidean'):
+        self.metric = metric
+
+    @abstractmethod
+    def fit(self, X: np.array) -> 'BaseNeighborIndex':
+        """Builds the index from scratch.
+
+        Args:
+            X: Samples to index of shape (n_samples, n_features).
+
+        Returns:
+            The object itself
+        """
+        pass
+
+    @abstractmethod
+    def add(self, X: np.array) -> 'BaseNeighborIndex':
+        """Adds samples to the index.
+
+        Args:
+            X: Samples to index of shape (n_samples, n_features).
+
+        Returns:
+            The object itself
+        """
+        pass
+
+    @abstractmethod
+    def query(self, X: np.array) -> np.array:
+        """Computes the distance to the nearest indexed sample.
+
+        Args:
+            X: Query samples of shape (n_samples, n_features).
+
+        Returns:
+            Distance of each sample to its nearest neighbor in the index.
+        """
+        pass
+
+
+class BruteNeighborIndex(BaseNeighborIndex):
+    """Exact index computing all the distances to indexed samples.
+
+    Supports scipy sparse samples.
+
+    Args:
+        metric: Metric to use for distance computation.
+    """
+    def fit(self, X: np.array) -> 'BruteNeighborIndex':
+        self.X_ = X if sparse.issparse(X) else np.asarray(X)
+        return self
+
+    def add(self, X: np.array) -> 'BruteNeighborIndex':
+        if sparse.issparse(self.X_):
+            self.X_ = sparse.vstack([self.X_, X], format='csr')
+        else:
+            self.X_ = np.concatenate([self.X_, X])
+        return self
+
+    def query(self, X: np.array) -> np.array:
+        return pairwise_distances_argmin_min(
+            X, self.X_, metric=self.metric)[1]
+
+
+class TreeNeighborIndex(BaseNeighborIndex):
+    """Exact index based on a KDTree or a BallTree.
+
+    Trees cannot be updated, so added samples are kept in a buffer searched
+    by brute force. The tree is rebuilt when the buffer becomes large
+    compared to it, which keeps the cost of additions amortized. Trees
+    require dense samples, a TypeError is raised for sparse ones.
+
+    Args:
+        algorithm: Either "kd_tree" or "ball_tree".
+        metric: Metric to use for distance computation. It must be supported
+            by the chosen tree.
+        leaf_size: Leaf size of the tree.
+        rebuild_ratio: The tree is rebuilt when the buffer holds more than
+            rebuild_ratio times the number of samples of the tree.
+    """
+    def __init__(self, algorithm: str = 'kd_tree',
+                 metric: str = 'euclidean', leaf_size: int = 40,
+                 rebuild_ratio: float = .5):
+        super().__init__(metric)
+        if algorithm not in ('kd_tree', 'ball_tree'):
+            raise ValueError('Unknown tree algorithm {}'.format(algorithm))
+        self.algorithm = algorithm
+        self.leaf_size = leaf_size
+        self.rebuild_ratio = rebuild_ratio
+
+    def _check_dense(self, X):
+        if sparse.issparse(X):
+            raise TypeError(
+                'Neighbor index {} does not support sparse samples, use '
+                '"brute" or "random_projection"'.format(self.algorithm))
+
+    def fit(self, X: np.array) -> 'TreeNeighborIndex':
+        self._check_dense(X)
+        tree_class = KDTree if self.algorithm == 'kd_tree' else BallTree
+        self.X_ = np.asarray(X)
+        self.tree_ = tree_class(self.X_, leaf_size=self.leaf_size,
+                                metric=self.metric)
+        self.buffer_ = self.X_[:0]
+        return self
+
+    def add(self, X: np.array) -> 'TreeNeighborIndex':
+        self._check_dense(X)
+        self.buffer_ = np.concatenate([self.buffer_, X])
+        if self.buffer_.shape[0] > self.rebuild_ratio * self.X_.shape[0]:
+            self.fit(np.concatenate([self.X_, self.buffer_]))
+        return self
+
+    def query(self, X: np.array) -> np.array:
+        distances = self.tree_.query(X, k=1)[0][:, 0]
+        if self.buffer_.shape[0] > 0:
+            np.minimum(distances, pairwise_distances_argmin_min(
+                X, self.buffer_, metric=self.metric)[1], out=distances)
+        return distances
+
+
+class RandomProjectionNeighborIndex(BaseNeighborIndex):
+    """Approximate index searching neighbors in a random projection.
+
+    Samples are projected on n_components random gaussian directions which
+    approximately preserves euclidean distances (Johnson-Lindenstrauss). The
+    nearest neighbor is then searched in this low dimensional space using a
+    tree, which is efficient contrary to high dimensional trees. Supports
+    scipy sparse samples.
+
+    Args:
+        n_components: Dimension of the projection space.
+        random_state: Random seeding of the projection.
+        leaf_size: Leaf size of the tree.
+        rebuild_ratio: See TreeNeighborIndex.
+    """
+    def __init__(self, n_components: int = 16,
+                 random_state: RandomStateType = None, leaf_size: int = 40,
+                 rebuild_ratio: float = .5):
+        super().__init__('euclidean')
+        self.n_components = n_components
+        self.random_state = random_state
+        self.leaf_size = leaf_size
+        self.rebuild_ratio = rebuild_ratio
+
+    def _project(self, X: np.array) -> np.array:
+        if not sparse.issparse(X):
+            X = np.asarray(X)
+        return np.asarray(X @ self.components_)
+
+    def fit(self, X: np.array) -> 'RandomProjectionNeighborIndex':
+        random_state = check_random_state(self.random_state)
+        self.components_ = random_state.normal(
+            size=(X.shape[1], self.n_components)) / np.sqrt(self.n_components)
+        self.index_ = TreeNeighborIndex(
+            'kd_tree', leaf_size=self.leaf_size,
+            rebuild_ratio=self.rebuild_ratio).fit(self._project(X))
+        return self
+
+    def add(self, X: np.array) -> 'RandomProjectionNeighborIndex':
+        self.index_.add(self._project(X))
+        return self
+
+    def query(self, X: np.array) -> np.array:
+        return self.index_.query(self._project(X))
+
+
+def check_neighbor_index(neighbors, metric: str = 'euclidean'):
+    """Returns the neighbor index matching a user specification.
+
+    Args:
+        neighbors: A BaseNeighborIndex instance or one of "brute", "kd_tree",
+            "ball_tree" and "random_projection". None means "brute".
+        metric: Metric used by the index when created from a string.
+
+    Returns:
+        A BaseNeighborIndex instance.
+    """
+    if isinstance(neighbors, BaseNeighborIndex):
+        return neighbors
+    if neighbors is None or neighbors == 'brute':
+        return BruteNeighborIndex(metric)
+    if neighbors in ('kd_tree', 'ball_tree'):
+        return TreeNeighborIndex(neighbors, metric=metric)
+    if neighbors == 'random_projection':
+        if metric != 'euclidean':
+            raise ValueError('Random projection neighbors only support the '
+                             'euclidean metric, got {}'.format(metric))
+        return RandomProjectionNeighborIndex()
+    raise ValueError('Unknown neighbor index {}'.format(neighbors))
@@ -0,0 +1,123 @@
+from time import perf_counter
+from typing import List, Tuple
+
+import numpy as np
+
+from .base import BaseQuerySampler
+from .pool import ActiveLearningPool
+from .utils import read_rows
+
+
+class SamplerPipeline(BaseQuerySampler):
+    """Chains samplers, each one selecting among the samples of the previous.
+
+    Each stage selects batch_size samples among the samples selected by the
+    previous stage, so a cheap sampler, such as an uncertainty sampler, can
+    prune the pool before an expensive diversity sampler. The first stage is
+    given X itself, or the pool itself if X is an ActiveLearningPool. Later
+    stages are given the rows selected by the previous stage only, read in
+    the order of the pool, and the full pool is never copied. Indices are
+    mapped back through all the stages to indices in X.
+
+    Args:
+        samplers: List of (name, sampler) tuples. The batch size of each
+            stage must not exceed the one of the previous stage, the batch
+            size of the pipeline being the one of the last stage. Names are
+            used as stage names when profiling.
+
+    Attributes:
+        selected_: Indices in X of the samples selected by each stage during
+            the last selection, by stage name.
+        stage_times_: Wall time in seconds of each stage during the last
+            selection, by stage name.
+        stage_sizes_: Number of samples each stage selected from during the
+            last selection, by stage name.
+    """
+    def __init__(self, samplers: List[Tuple[str, BaseQuerySampler]]):
+        if not samplers:
+            raise ValueError('A pipeline requires at least one sampler')
+        for (_, previous), (name, sampler) in zip(samplers, samplers[1:]):
+            if sampler.batch_size > previous.batch_size:
+                raise ValueError(
+                    'Stage {} selects {} samples among the {} samples of the '
+                    'previous stage'.format(name, sampler.batch_size,
+                                            previous.batch_size))
+        super().__init__(samplers[-1][1].batch_size)
+        self.samplers = samplers
+
+    def enable_profiling(self, logger=None, track_memory: bool = False):
+        # Stages of the inner samplers are recorded in the same profile
+        super().enable_profiling(logger=logger, track_memory=track_memory)
+        for _, sampler in self.samplers:
+            sampler.profile_ = self.profile_
+        return self
+
+    def disable_profiling(self):
+        super().disable_profiling()
+        for _, sampler in self.samplers:
+            sampler.disable_profiling()
+        return self
+
+    def fit(self, X: np.array, y: np.array = None) -> 'SamplerPipeline':
+        """Fits all the samplers on labeled samples.
+
+        Args:
+            X: Labeled samples of shape (n_samples, n_features).
+            y: Labels of shape (n_samples).
+
+        Returns:
+            The object itself
+        """
+        for _, sampler in self.samplers:
+            sampler.fit(X, y)
+        return self
+
+    def select_samples(self, X: np.array,
+                       sample_weight: np.array = None) -> np.array:
+        """Selects samples by running the stages one after the other.
+
+        Args:
+            X: Pool of unlabeled samples of shape (n_samples, n_features),
+                or an ActiveLearningPool.
+            sample_weight: Weight of the samples of shape (n_samples),
+                optional. It is given to the last stage, restricted to the
+                samples it selects from. If X is an ActiveLearningPool, it
+                is given for all the samples of the pool.
+
+        Returns:
+            Indices of the selected samples of shape (batch_size). If X is an
+            ActiveLearningPool, these are indices in the pool.
+        """
+        if isinstance(X, ActiveLearningPool):
+            data, n_samples = X.X, X.n_unlabeled
+        else:
+            data, n_samples = X, X.shape[0]
+        self.selected_ = {}
+        self.stage_times_ = {}
+        self.stage_sizes_ = {}
+        index = None
+
+        for i, (name, sampler) in enumerate(self.samplers):
+            kwargs = {}
+            if sample_weight is not None and i == len(self.samplers) - 1:
+                kwargs['sample_weight'] = (
+                    sample_weight if index is None else sample_weight[index])
+
+            start = perf_counter()
+            if index is None:
+                self.stage_sizes_[name] = n_samples
+                with self._stage(name, n_samples):
+                    index = np.asarray(sampler.select_samples(X, **kwargs))
+            else:
+                self.stage_sizes_[name] = index.shape[0]
+                with self._stage(name, index.shape[0]):
+                    selected = sampler.select_samples(
+                        read_rows(data, index), **kwargs)
+                index = index[selected]
+            self.stage_times_[name] = perf_counter() - start
+            self.selected_[name] = index
+
+            if i < len(self.samplers) - 1:
+                # Rows are read in the order of the pool
+                index = np.sort(index)
+        return index
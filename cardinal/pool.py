@@ -0,0 +1,200 @@
+import numpy as np
+
+from .utils import (chunk_slices, is_out_of_core, read_rows,
+                    DEFAULT_CHUNK_SIZE)
+
+
+def read_slice(X, s: slice):
+    """Reads a slice of rows of X, or of the unlabeled samples of X if it is
+    an ActiveLearningPool.
+
+    Args:
+        X: Array, sparse matrix, chunked array or ActiveLearningPool.
+        s: Slice of rows.
+
+    Returns:
+        The rows, as a sparse matrix if X is sparse, as an array otherwise.
+    """
+    if isinstance(X, ActiveLearningPool):
+        return X.unlabeled_chunk(s)
+    return read_rows(X, s)
+
+
+class ActiveLearningPool:
+    """Holds the data of an experiment and tracks which samples are labeled.
+
+    Samplers accept a pool in place of X in select_samples. They then select
+    among unlabeled samples and return global indices, i.e. row indices in
+    the pool, so that there is no need to copy X[~mask] at each iteration and
+    to map the selected indices back.
+
+    Unlabeled samples are given to samplers by chunks. A chunk of contiguous
+    samples is a view on X, otherwise only the chunk is copied.
+
+    Args:
+        X: Samples of shape (n_samples, n_features). Can be a scipy sparse
+            matrix or an out-of-core array such as a np.memmap or an HDF5
+            dataset, see cardinal.utils.is_out_of_core.
+        y: Labels of shape (n_samples), optional. Values of unlabeled
+            samples are ignored.
+        labeled: Indices or boolean mask of the initially labeled samples.
+        chunk_size: Number of samples per chunk given to samplers.
+
+    Attributes:
+        labeled_mask: Boolean mask of labeled samples of shape (n_samples).
+    """
+    def __init__(self, X, y=None, labeled=None,
+                 chunk_size: int = DEFAULT_CHUNK_SIZE):
+        self.X = X
+        self.y = y
+        self.chunk_size = chunk_size
+        self.labeled_mask = np.zeros(X.shape[0], dtype=bool)
+        if labeled is not None:
+            self.labeled_mask[labeled] = True
+        self._unlabeled_index = None
+
+    @classmethod
+    def from_npy(cls, path: str, y=None, labeled=None,
+                 chunk_size: int = DEFAULT_CHUNK_SIZE,
+                 mmap_mode: str = 'r') -> 'ActiveLearningPool':
+        """Creates a pool from a .npy file, memory-mapped by default.
+
+        Args:
+            path: Path of the .npy file holding the samples.
+            y: Labels of shape (n_samples), optional.
+            labeled: Indices or boolean mask of the labeled samples.
+            chunk_size: Number of samples per chunk given to samplers.
+            mmap_mode: Memory mapping mode given to np.load. None loads the
+                data in memory.
+
+        Returns:
+            The pool.
+        """
+        return cls(np.load(path, mmap_mode=mmap_mode), y=y, labeled=labeled,
+                   chunk_size=chunk_size)
+
+    @property
+    def n_samples(self) -> int:
+        return self.labeled_mask.shape[0]
+
+    @property
+    def n_labeled(self) -> int:
+        return self.n_samples - self.n_unlabeled
+
+    @property
+    def n_unlabeled(self) -> int:
+        return self.unlabeled_index.shape[0]
+
+    @property
+    def labeled_index(self) -> np.array:
+        """Sorted global indices of labeled samples."""
+        return np.flatnonzero(self.labeled_mask)
+
+    @property
+    def unlabeled_index(self) -> np.array:
+        """Sorted global indices of unlabeled samples.
+
+        The index is cached until samples are labeled. Local indices returned
+        by samplers are positions in this array.
+        """
+        if self._unlabeled_index is None:
+            self._unlabeled_index = np.flatnonzero(~self.labeled_mask)
+        return self._unlabeled_index
+
+    def label(self, index: np.array, y: np.array = None):
+        """Marks samples as labeled.
+
+        Args:
+            index: Global indices of the samples.
+            y: Labels of the samples, optional. The pool must have been
+                created with labels.
+        """
+        if y is not None and self.y is None:
+            raise ValueError('Labels cannot be stored in a pool created '
+                             'without y')
+        self.labeled_mask[index] = True
+        if y is not None:
+            self.y[index] = y
+        self._unlabeled_index = None
+
+    def to_global(self, index: np.array) -> np.array:
+        """Translates indices among unlabeled samples into global indices.
+
+        Args:
+            index: Positions among unlabeled samples.
+
+        Returns:
+            Indices of the samples in the pool.
+        """
+        return self.unlabeled_index[index]
+
+    def get_labeled(self):
+        """Returns copies of the labeled samples and of their labels.
+
+        Returns:
+            X_labeled, y_labeled. y_labeled is None if the pool has no y.
+        """
+        index = self.labeled_index
+        y = None if self.y is None else self.y[index]
+        return read_rows(self.X, index), y
+
+    def get_unlabeled(self) -> np.array:
+        """Returns a copy of the unlabeled samples."""
+        return read_rows(self.X, self.unlabeled_index)
+
+    def unlabeled_chunk(self, s: slice) -> np.array:
+        """Returns a slice of the unlabeled samples.
+
+        The result is a view on X if the samples are contiguous.
+
+        Args:
+            s: Slice of positions among unlabeled samples.
+        """
+        index = self.unlabeled_index[s]
+        if index.shape[0] == 0:
+            return read_rows(self.X, slice(0, 0))
+        if index[-1] - index[0] + 1 == index.shape[0]:
+            return read_rows(self.X, slice(index[0], index[-1] + 1))
+        return read_rows(self.X, index)
+
+    def unlabeled_view(self) -> '_UnlabeledView':
+        """Returns the unlabeled samples as a chunked array.
+
+        The view follows the chunked array protocol of
+        cardinal.utils.is_out_of_core: rows are only read when sliced.
+        """
+        return _UnlabeledView(self)
+
+    def iter_unlabeled(self, chunk_size: int = None):
+        """Iterates over unlabeled samples by chunks.
+
+        Args:
+            chunk_size: Number of samples per chunk. Defaults to the chunk
+                size of the pool.
+
+        Returns:
+            A generator of arrays of shape (chunk_size, n_features).
+        """
+        for s in chunk_slices(self.n_unlabeled,
+                              chunk_size or self.chunk_size):
+            yield self.unlabeled_chunk(s)
+
+
+class _UnlabeledView:
+    """Chunked array of the unlabeled samples of a pool."""
+    def __init__(self, pool: ActiveLearningPool):
+        self.pool = pool
+        self.shape = (pool.n_unlabeled,) + tuple(pool.X.shape[1:])
+
+    def __len__(self) -> int:
+        return self.shape[0]
+
+    def __getitem__(self, key) -> np.array:
+        if isinstance(key, slice):
+            return self.pool.unlabeled_chunk(key)
+        return read_rows(self.pool.X, self.pool.unlabeled_index[key])
+
+    def __array__(self, dtype=None, copy=None) -> np.array:
+        # Samplers that cannot process chunks load the unlabeled samples
+        X = self.pool.get_unlabeled()
+        return X if dtype is None else X.astype(dtype)
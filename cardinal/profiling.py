@@ -0,0 +1,128 @@
+import logging
+import threading
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+from time import perf_counter
+
+
+# Returned by BaseQuerySampler._stage when profiling is disabled
+NULL_STAGE = nullcontext()
+
+
+class SamplerProfile:
+    """Records the wall time, memory and number of rows of sampler stages.
+
+    Samplers wrap their stages, such as fitting the classifier, predicting
+    probabilities, scoring, sorting, clustering or assigning samples to
+    centers, in a stage context. Statistics of each stage are summed over
+    all the calls until reset is called.
+
+    Args:
+        logger: If specified, a message is logged at INFO level when a stage
+            ends.
+        track_memory: If True, memory allocated during stages is measured
+            with tracemalloc, which is started if needed. This slows down
+            allocations noticeably. tracemalloc is process-wide: when stages
+            run concurrently, e.g. samplers with n_jobs > 1, allocations and
+            peaks of a stage include the ones of other threads. Before Python
+            3.9, peaks cannot be reset and are the highest memory used since
+            tracing started.
+
+    Attributes:
+        stages: Mapping from stage names to dictionaries with keys calls,
+            time (in seconds), n_rows, allocated (net bytes allocated) and
+            peak (highest memory used during the stage above the memory used
+            when it started, in bytes). Memory keys are only present if
+            track_memory is True.
+    """
+    def __init__(self, logger: logging.Logger = None,
+                 track_memory: bool = False):
+        self.logger = logger
+        self.track_memory = track_memory
+        self._started_tracing = track_memory and not tracemalloc.is_tracing()
+        if self._started_tracing:
+            tracemalloc.start()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.reset()
+
+    def __getstate__(self):
+        # Locks and thread-local stacks cannot be pickled, e.g. when a
+        # sampler is saved in a checkpoint
+        state = self.__dict__.copy()
+        del state['_lock'], state['_local']
+        state['_started_tracing'] = False
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        if self.track_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracing = True
+
+    def reset(self):
+        """Forgets all recorded statistics."""
+        self.stages = {}
+
+    def close(self):
+        """Stops tracemalloc if it was started by this profile."""
+        if self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+
+    @contextmanager
+    def stage(self, name: str, n_rows: int = 0):
+        """Measures a stage.
+
+        Stages can be nested, in which case the time of the inner stage is
+        also counted in the outer one.
+
+        Args:
+            name: Name of the stage.
+            n_rows: Number of samples processed by the stage.
+        """
+        stack = getattr(self._local, 'stack', None)
+        if stack is None:
+            stack = self._local.stack = []
+
+        frame = {}
+        if self.track_memory:
+            current, peak = tracemalloc.get_traced_memory()
+            if stack:
+                stack[-1]['peak'] = max(stack[-1]['peak'], peak)
+            if hasattr(tracemalloc, 'reset_peak'):
+                tracemalloc.reset_peak()
+            frame = {'start': current, 'peak': current}
+        stack.append(frame)
+
+        start = perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = perf_counter() - start
+            stack.pop()
+            stats = {'calls': 1, 'time': elapsed, 'n_rows': n_rows}
+            if self.track_memory:
+                current, peak = tracemalloc.get_traced_memory()
+                peak = max(frame['peak'], peak)
+                if stack:
+                    stack[-1]['peak'] = max(stack[-1]['peak'], peak)
+                stats['allocated'] = current - frame['start']
+                stats['peak'] = peak - frame['start']
+            self._record(name, stats)
+
+    def _record(self, name: str, stats: dict):
+        with self._lock:
+            total = self.stages.setdefault(
+                name, {key: 0 for key in stats})
+            for key, value in stats.items():
+                if key == 'peak':
+                    total[key] = max(total[key], value)
+                else:
+                    total[key] += value
+
+        if self.logger is not None:
+            self.logger.info('Stage %s took %.6fs on %d rows', name,
+                             stats['time'], stats['n_rows'])
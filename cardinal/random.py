@@ -1,19 +1,93 @@
+from typing import Iterable
+
 import numpy as np
 
 from .base import ScoredQuerySampler
+from .pool import ActiveLearningPool
 from .typeutils import RandomStateType, check_random_state
 
 
+def sample_without_replacement(n_samples: int, size: int,
+                               random_state: RandomStateType = None
+                               ) -> np.array:
+    """Draws size distinct integers uniformly in range(n_samples).
+
+    Uses Floyd's algorithm which runs in O(size) time and memory, whatever
+    the value of n_samples.
+
+    Args:
+        n_samples: Size of the population.
+        size: Number of integers to draw.
+        random_state: Random seeding, can be a numpy Generator.
+
+    Returns:
+        The sorted drawn integers of shape (size).
+    """
+    random_state = check_random_state(random_state)
+    size = min(size, n_samples)
+    # Floyd's draws do not depend on previous picks, they are vectorized
+    highs = np.arange(n_samples - size + 1, n_samples + 1)
+    draws = (random_state.random(size) * highs).astype(np.intp)
+
+    selected = set()
+    for high, draw in zip(highs.tolist(), draws.tolist()):
+        selected.add(draw if draw not in selected else high - 1)
+    return np.sort(np.fromiter(selected, dtype=np.intp, count=size))
+
+
+def reservoir_sample(chunk_sizes: Iterable[int], size: int,
+                     random_state: RandomStateType = None) -> np.array:
+    """Draws size distinct indices uniformly in a pool streamed by chunks.
+
+    Only the sizes of the chunks are needed. Reservoir sampling (algorithm R)
+    is vectorized over each chunk and uses O(size) memory.
+
+    Args:
+        chunk_sizes: Sizes of the successive chunks of the pool.
+        size: Number of indices to draw.
+        random_state: Random seeding, can be a numpy Generator.
+
+    Returns:
+        The sorted drawn indices, all of them if the pool has less than size
+        samples.
+    """
+    random_state = check_random_state(random_state)
+    reservoir = np.empty(size, dtype=np.intp)
+    n_seen = 0
+
+    for chunk_size in chunk_sizes:
+        index = np.arange(n_seen, n_seen + chunk_size)
+        n_fill = min(max(size - n_seen, 0), chunk_size)
+        reservoir[n_seen:n_seen + n_fill] = index[:n_fill]
+        index = index[n_fill:]
+        # Sample i replaces a random slot with probability size / (i + 1)
+        slots = (random_state.random(index.shape[0])
+                 * (index + 1)).astype(np.intp)
+        accepted = slots < size
+        slots, index = slots[accepted], index[accepted]
+        # When a slot is drawn several times, the last sample wins
+        _, last = np.unique(slots[::-1], return_index=True)
+        last = slots.shape[0] - 1 - last
+        reservoir[slots[last]] = index[last]
+        n_seen += chunk_size
+
+    return np.sort(reservoir[:min(size, n_seen)])
+
+
 class RandomSampler(ScoredQuerySampler):
     """Randomly select samples
 
+    Samples are drawn directly from the size of the pool, without scoring it,
+    so the cost of a selection is O(batch_size) and X is never read.
+
     Args:
         batch_size : Number of samples to select.
         random_state : The seed of the pseudo random number generator to use
             when shuffling the data.  If int, random_state is the seed used by
-            the random number generator; If RandomState instance, random_state
-            is the random number generator; If None (defdault), the random
-            number generator is the RandomState instance used by `np.random`.
+            the random number generator; If RandomState or Generator instance,
+            random_state is the random number generator; If None (defdault),
+            the random number generator is the RandomState instance used by
+            `np.random`.
 
     Attributes:
         random_state : The random state used by the sampler.
@@ -37,4 +111,49 @@ class RandomSampler(ScoredQuerySampler):
         return self
 
     def score_samples(self, X: np.array) -> np.array:
-        return self.random_state.rand(X.shape[0])
+        self.random_state = check_random_state(self.random_state)
+        return self.random_state.random(X.shape[0])
+
+    def select_samples(self, X: np.array) -> np.array:
+        """Selects random samples. Only the number of samples of X is used.
+
+        Args:
+            X: Pool of unlabeled samples of shape (n_samples, n_features),
+                or an ActiveLearningPool.
+
+        Returns:
+            Indices of the selected samples of shape (batch_size).
+        """
+        if isinstance(X, ActiveLearningPool):
+            if self._not_enough_n_samples(X.n_unlabeled):
+                return X.unlabeled_index
+            self.random_state = check_random_state(self.random_state)
+            with self._stage('select', X.n_unlabeled):
+                return X.to_global(sample_without_replacement(
+                    X.n_unlabeled, self.batch_size, self.random_state))
+
+        if self._not_enough_samples(X):
+            return np.arange(X.shape[0])
+        self.random_state = check_random_state(self.random_state)
+        with self._stage('select', X.shape[0]):
+            return sample_without_replacement(
+                X.shape[0], self.batch_size, self.random_state)
+
+    def select_samples_iter(self, chunks: Iterable[np.array]) -> np.array:
+        """Selects random samples from a pool given as successive chunks.
+
+        Only the number of samples of each chunk is used.
+
+        Args:
+            chunks: Iterable of arrays that, concatenated, form the pool of
+                unlabeled samples.
+
+        Returns:
+            Indices of the selected samples in the concatenated pool of shape
+            (batch_size).
+        """
+        self.random_state = check_random_state(self.random_state)
+        selected = reservoir_sample((chunk.shape[0] for chunk in chunks),
+                                    self.batch_size, self.random_state)
+        self._not_enough_n_samples(selected.shape[0])
+        return selected
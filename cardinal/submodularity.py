@@ -1,29 +1,237 @@
+import heapq
+
 from .version import check_modules
 
-check_modules('submodular', 'submodularity')  # noqa
+check_modules('sklearn', 'submodularity')  # noqa
 
 import numpy as np
-from apricot import FacilityLocationSelection
+from scipy import sparse
 from sklearn.metrics import pairwise_distances
+from sklearn.neighbors import NearestNeighbors
 
 from .base import BaseQuerySampler
-from .typeutils import MetricType
+from .pool import ActiveLearningPool
+from .typeutils import MetricType, RandomStateType, check_random_state
+from .utils import chunk_slices
+
+
+def knn_similarity_graph(X: np.array, n_neighbors: int,
+                         metric: MetricType = 'euclidean',
+                         chunk_size: int = 10000,
+                         n_jobs: int = 1) -> sparse.csr_matrix:
+    """Builds a sparse similarity graph between each sample and its
+    nearest neighbors.
+
+    Neighbors are queried by chunks so that memory usage is O(n_samples *
+    n_neighbors). Similarities are 1 / (1 + distance) and the graph is made
+    symmetric. Each sample is its own neighbor with similarity 1.
+
+    Args:
+        X: Samples of shape (n_samples, n_features).
+        n_neighbors: Number of neighbors of each sample, itself included.
+        metric: Metric to use for distance computation.
+        chunk_size: Number of samples queried at once.
+        n_jobs: Number of jobs to run in parallel. -1 means using all cores.
+
+    Returns:
+        Similarity matrix of shape (n_samples, n_samples).
+    """
+    n_samples = X.shape[0]
+    n_neighbors = min(n_neighbors, n_samples)
+    model = NearestNeighbors(n_neighbors=n_neighbors, metric=metric,
+                             n_jobs=n_jobs).fit(X)
+
+    data = np.empty((n_samples, n_neighbors))
+    indices = np.empty((n_samples, n_neighbors), dtype=np.intp)
+    for s in chunk_slices(n_samples, chunk_size):
+        data[s], indices[s] = model.kneighbors(X[s])
+    data += 1
+    np.reciprocal(data, out=data)
+
+    graph = sparse.csr_matrix(
+        (data.ravel(), indices.ravel(),
+         np.arange(0, n_samples * n_neighbors + 1, n_neighbors)),
+        shape=(n_samples, n_samples))
+    return graph.maximum(graph.T).tocsr()
+
+
+class _FacilityLocationGains:
+    """Computes facility location gains by blocks of candidate columns.
+
+    The similarity matrix is either given, dense or sparse, or computed on the
+    fly from the samples, one block of columns at a time, as
+    1 / (1 + distance). The full dense matrix is therefore never needed.
+    """
+    def __init__(self, X, metric: MetricType, block_size: int, n_jobs: int):
+        self.metric = metric
+        self.block_size = block_size
+        self.n_jobs = n_jobs
+        if metric == 'precomputed' and sparse.issparse(X):
+            X = sparse.csc_matrix(X)
+        self.X = X
+        self.n_samples = X.shape[0]
+
+    def _dense_block(self, columns: np.array) -> np.array:
+        if self.metric == 'precomputed':
+            return np.asarray(self.X[:, columns])
+        block = pairwise_distances(self.X, self.X[columns],
+                                   metric=self.metric, n_jobs=self.n_jobs)
+        block += 1
+        return np.reciprocal(block, out=block)
+
+    def gains(self, columns: np.array, current: np.array) -> np.array:
+        """Gains of adding each column given the current coverage."""
+        gains = np.empty(columns.shape[0])
+        for s in chunk_slices(columns.shape[0], self.block_size):
+            if self.metric == 'precomputed' and sparse.issparse(self.X):
+                block = self.X[:, columns[s]]
+                improvement = np.maximum(
+                    block.data - current[block.indices], 0)
+                owners = np.repeat(np.arange(s.stop - s.start),
+                                   np.diff(block.indptr))
+                gains[s] = np.bincount(owners, weights=improvement,
+                                       minlength=s.stop - s.start)
+            else:
+                block = self._dense_block(columns[s])
+                block -= current[:, None]
+                np.maximum(block, 0, out=block)
+                gains[s] = block.sum(axis=0)
+        return gains
+
+    def update(self, column: int, current: np.array):
+        """Updates in place the coverage when a column is selected."""
+        if self.metric == 'precomputed' and sparse.issparse(self.X):
+            block = self.X[:, [column]]
+            current[block.indices] = np.maximum(
+                current[block.indices], block.data)
+        else:
+            np.maximum(current, self._dense_block([column])[:, 0],
+                       out=current)
+
+
+def facility_location(X, n_select: int, metric: MetricType = 'precomputed',
+                      optimizer: str = 'lazy', epsilon: float = 0.1,
+                      block_size: int = 1024,
+                      random_state: RandomStateType = None,
+                      n_jobs: int = 1) -> np.array:
+    """Greedily maximizes the facility location function.
+
+    The facility location of a set S is sum_i max_{j in S} sim(i, j). Two
+    greedy optimizers are available:
+
+    * "lazy" keeps upper bounds of the gains in a priority queue and only
+      recomputes the gains of the best candidates, block_size at a time,
+      until the best one is exact. By submodularity, it selects the same
+      samples as the naive greedy algorithm with far fewer gain
+      evaluations.
+    * "stochastic" evaluates, at each step, a random subset of
+      n_samples / n_select * log(1 / epsilon) candidates. It is faster and
+      its solution is a (1 - 1/e - epsilon) approximation in expectation.
+
+    Args:
+        X: Similarity matrix of shape (n_samples, n_samples), dense or
+            sparse, if metric is "precomputed". Samples of shape
+            (n_samples, n_features) otherwise, similarities are then computed
+            by blocks as 1 / (1 + distance).
+        n_select: Number of samples to select.
+        metric: Metric to use for distance computation.
+        optimizer: Either "lazy" or "stochastic".
+        epsilon: Approximation parameter of the stochastic optimizer. Higher
+            values are faster.
+        block_size: Number of candidates whose gains are computed at once.
+        random_state: Random seeding of the stochastic optimizer.
+        n_jobs: Number of jobs used for distance computation.
+
+    Returns:
+        Indices of the selected samples in selection order.
+    """
+    blocks = _FacilityLocationGains(X, metric, block_size, n_jobs)
+    n_samples = blocks.n_samples
+    n_select = min(n_select, n_samples)
+    current = np.zeros(n_samples)
+    selected = []
+
+    if optimizer == 'lazy':
+        # Entries are (-gain, candidate, number of selected samples when the
+        # gain was computed), gains of earlier steps being upper bounds
+        gains = blocks.gains(np.arange(n_samples), current)
+        heap = list(zip((-gains).tolist(), range(n_samples),
+                        [0] * n_samples))
+        heapq.heapify(heap)
+        while len(selected) < n_select:
+            if heap[0][2] == len(selected):
+                # An exact gain above all the upper bounds is the best one
+                candidate = heapq.heappop(heap)[1]
+                selected.append(candidate)
+                blocks.update(candidate, current)
+                continue
+            # The stale candidates with the highest bounds are evaluated
+            # together, which is far cheaper than one at a time
+            stale = []
+            while (heap and len(stale) < block_size
+                   and heap[0][2] != len(selected)):
+                stale.append(heapq.heappop(heap)[1])
+            gains = blocks.gains(np.array(stale), current)
+            for gain, candidate in zip(gains.tolist(), stale):
+                heapq.heappush(heap, (-gain, candidate, len(selected)))
+
+    elif optimizer == 'stochastic':
+        random_state = check_random_state(random_state)
+        available = np.ones(n_samples, dtype=bool)
+        sample_size = int(np.ceil(
+            n_samples / n_select * np.log(1 / epsilon)))
+        for _ in range(n_select):
+            candidates = np.flatnonzero(available)
+            if candidates.shape[0] > sample_size:
+                candidates = random_state.choice(
+                    candidates, sample_size, replace=False)
+            best = candidates[np.argmax(blocks.gains(candidates, current))]
+            selected.append(best)
+            available[best] = False
+            blocks.update(best, current)
+
+    else:
+        raise ValueError('Unknown optimizer {}'.format(optimizer))
+
+    return np.asarray(selected)
 
 
 class SubmodularSampler(BaseQuerySampler):
     """Select samples using a facility location selector
+
+    Similarities between samples are 1 / (1 + distance) in all modes, unless
+    metric is "precomputed", in which case X is the similarity matrix.
     
     Args:
         batch_size: Number of samples to select.
         metric: Metric to use for distance computation.
         n_jobs: Number of jobs to run in parallel. -1 means using all cores.
+        n_neighbors: If specified, facility location is computed on a sparse
+            similarity graph between each sample and its n_neighbors nearest
+            neighbors instead of the dense distance matrix. Memory usage is
+            then O(n_samples * n_neighbors).
+        chunk_size: Number of samples for which neighbors are searched at
+            once when building the sparse graph.
+        optimizer: "apricot" uses apricot's FacilityLocationSelection on the
+            dense similarity matrix. "lazy" and "stochastic" use the
+            native optimizers of facility_location, which compute
+            similarities by blocks and do not require apricot.
+        epsilon: Approximation parameter of the stochastic optimizer.
+        random_state: Random seeding of the stochastic optimizer.
     """
 
     def __init__(self, batch_size: int, metric: MetricType = 'euclidean',
-                 n_jobs: int = 1):
+                 n_jobs: int = 1, n_neighbors: int = None,
+                 chunk_size: int = 10000, optimizer: str = 'apricot',
+                 epsilon: float = 0.1, random_state: RandomStateType = None):
         super().__init__(batch_size)
         self.metric = metric
         self.n_jobs = n_jobs
+        self.n_neighbors = n_neighbors
+        self.chunk_size = chunk_size
+        self.optimizer = optimizer
+        self.epsilon = epsilon
+        self.random_state = random_state
 
     def fit(self, X: np.array, y: np.array = None) -> 'SubmodularSampler':
         """Does nothing.
@@ -41,20 +249,52 @@ class SubmodularSampler(BaseQuerySampler):
         """Select the best samples using submodular optimization.
 
         Args:
-            X: Pool of unlabeled samples of shape (n_samples, n_features).
+            X: Pool of unlabeled samples of shape (n_samples, n_features),
+                or an ActiveLearningPool.
 
         Returns:
             Indices of the selected samples of shape (batch_size).
         """
+        if isinstance(X, ActiveLearningPool):
+            if self.metric == 'precomputed':
+                # Only unlabeled rows would be given, not a square matrix
+                raise ValueError('Precomputed metrics are not supported '
+                                 'with an ActiveLearningPool')
+            return self._select_from_pool(X)
+
         if self._not_enough_samples(X):
             return np.arange(X.shape[0])
 
-        if self.metric != 'precomputed':
-            distances = pairwise_distances(
-                X, metric=self.metric, n_jobs=self.n_jobs)
-            model = FacilityLocationSelection(
-                self.batch_size, pairwise_func='precomputed').fit(distances)
-        else:  
+        metric = 'precomputed'
+        with self._stage('similarity', X.shape[0]):
+            if self.metric == 'precomputed':
+                pairwise = X
+            elif self.n_neighbors is not None:
+                pairwise = knn_similarity_graph(
+                    X, self.n_neighbors, metric=self.metric,
+                    chunk_size=self.chunk_size, n_jobs=self.n_jobs)
+            elif self.optimizer != 'apricot':
+                # Similarities are computed by blocks by the optimizer
+                pairwise, metric = X, self.metric
+            else:
+                # Same similarities as the sparse graph and the native
+                # optimizers, apricot reading the matrix as similarities
+                pairwise = pairwise_distances(
+                    X, metric=self.metric, n_jobs=self.n_jobs)
+                pairwise += 1
+                np.reciprocal(pairwise, out=pairwise)
+
+        if self.optimizer != 'apricot':
+            with self._stage('optimization', X.shape[0]):
+                return facility_location(
+                    pairwise, self.batch_size, metric=metric,
+                    optimizer=self.optimizer, epsilon=self.epsilon,
+                    random_state=self.random_state, n_jobs=self.n_jobs)
+
+        check_modules('submodular', 'submodularity')
+        from apricot import FacilityLocationSelection
+
+        with self._stage('optimization', X.shape[0]):
             model = FacilityLocationSelection(
-                self.batch_size, pairwise_func='precomputed').fit(X)
+                self.batch_size, metric='precomputed').fit(pairwise)
         return model.ranking
@@ -0,0 +1,128 @@
+import logging
+import tracemalloc
+
+import numpy as np
+from numpy.testing import assert_array_equal
+from sklearn.datasets import make_classification
+from sklearn.linear_model import LogisticRegression
+
+from cardinal.uncertainty import MarginSampler
+from cardinal.zhdanov2019 import TwoStepKMeansSampler
+
+
+def test_chunked_selection():
+    rng = np.random.RandomState(0)
+    proba = rng.dirichlet(np.ones(4), size=1000)
+    # Duplicate samples to make sure that ties are broken consistently
+    proba = np.concatenate([proba, proba])
+
+    sampler = MarginSampler('precomputed', 30)
+    expected = sampler.select_samples(proba)
+
+    for chunk_size in [1, 7, 30, 1000, 5000]:
+        sampler = MarginSampler('precomputed', 30, chunk_size=chunk_size)
+        assert_array_equal(sampler.select_samples(proba), expected)
+
+    sampler = MarginSampler('precomputed', 30)
+    chunks = (proba[i:i + 300] for i in range(0, proba.shape[0], 300))
+    assert_array_equal(sampler.select_samples_iter(chunks), expected)
+
+
+def test_parallel_selection():
+    rng = np.random.RandomState(0)
+    proba = rng.dirichlet(np.ones(4), size=1000)
+    proba = np.concatenate([proba, proba])
+
+    expected = MarginSampler('precomputed', 30).select_samples(proba)
+
+    for chunk_size in [None, 7, 1000]:
+        sampler = MarginSampler('precomputed', 30, chunk_size=chunk_size,
+                                n_jobs=3)
+        assert_array_equal(sampler.select_samples(proba), expected)
+
+
+def test_weighted_selection():
+    scores = np.array([0., -1., 1., 2., 5.])
+    sampler = MarginSampler('precomputed', 2, strategy='weighted')
+    sampler.score_samples = lambda X: X
+
+    counts = np.zeros(scores.shape[0])
+    for _ in range(2000):
+        selected = sampler.select_samples(scores)
+        assert np.unique(selected).shape[0] == 2
+        counts[selected] += 1
+    # Non positive scores are never drawn
+    assert_array_equal(counts[:2], 0)
+    assert counts[2] < counts[3] < counts[4]
+
+    # First draw is proportional to the weights
+    sampler.batch_size = 1
+    counts = np.zeros(scores.shape[0])
+    for _ in range(4000):
+        counts[sampler.select_samples(scores)] += 1
+    assert np.allclose(counts / 4000, [0, 0, 1 / 8, 2 / 8, 5 / 8], atol=.03)
+
+    # Low temperature softmax selects the top scores
+    sampler = MarginSampler('precomputed', 2, strategy='softmax',
+                            temperature=1e-3, chunk_size=2)
+    sampler.score_samples = lambda X: X
+    assert_array_equal(np.sort(sampler.select_samples(scores)), [3, 4])
+
+
+def test_profiling(caplog):
+    X, y = make_classification(500, n_features=5, random_state=0)
+    sampler = MarginSampler(LogisticRegression(), 10, chunk_size=100)
+    sampler.fit(X[:50], y[:50])
+    sampler.select_samples(X[50:])
+    assert not hasattr(sampler, 'profile_')
+
+    logger = logging.getLogger('cardinal.test')
+    sampler.enable_profiling(logger=logger, track_memory=True)
+    with caplog.at_level(logging.INFO, logger='cardinal.test'):
+        sampler.fit(X[:50], y[:50])
+        sampler.select_samples(X[50:])
+    stages = sampler.profile_.stages
+    assert stages['fit']['calls'] == 1 and stages['fit']['n_rows'] == 50
+    assert stages['predict_proba']['n_rows'] == 450
+    assert stages['score']['calls'] == 5
+    assert stages['score']['time'] >= stages['predict_proba']['time']
+    assert stages['score']['peak'] > 0
+    assert 'Stage fit took' in caplog.text
+
+    sampler.disable_profiling()
+    assert not hasattr(sampler, 'profile_')
+    assert not tracemalloc.is_tracing()
+
+    sampler = TwoStepKMeansSampler(2, LogisticRegression(), 5, n_init=1)
+    sampler.enable_profiling()
+    sampler.fit(X[:50], y[:50])
+    sampler.select_samples(X[50:])
+    assert {'fit', 'preselection', 'clustering', 'kmeans'} <= set(
+        sampler.profile_.stages)
+
+
+def test_selection_keys_null_scores():
+    # NaN scores are never ranked first
+    scores = np.array([np.nan, 1., 2., 0.])
+    sampler = MarginSampler('precomputed', 2)
+    sampler.score_samples = lambda X: X
+    assert_array_equal(np.sort(sampler.select_samples(scores)), [1, 2])
+
+    # Missing samples are drawn uniformly among null and NaN scores
+    scores = np.array([0., 0., np.nan, -1., 3.])
+    sampler = MarginSampler('precomputed', 2, strategy='weighted')
+    sampler.score_samples = lambda X: X
+    counts = np.zeros(scores.shape[0])
+    for _ in range(2000):
+        counts[sampler.select_samples(scores)] += 1
+    assert counts[4] == 2000
+    assert np.allclose(counts[:4] / 2000, .25, atol=.05)
+
+    # The random strategies are seeded
+    selections = [
+        MarginSampler('precomputed', 2, strategy='weighted',
+                      random_state=0).select_samples(
+                          np.random.RandomState(1).dirichlet(
+                              np.ones(3), size=50))
+        for _ in range(2)]
+    assert_array_equal(selections[0], selections[1])
@@ -0,0 +1,81 @@
+import numpy as np
+import pytest
+from numpy.testing import assert_array_equal
+from sklearn.metrics import pairwise_distances
+
+from cardinal.batch import RankedBatchSampler
+from cardinal.pool import ActiveLearningPool
+from cardinal.typeutils import NotEnoughSamplesWarning
+
+
+def _naive_ranked_batch(X, samples_weights, batch_size):
+    labeled = samples_weights < -.5
+    unlabeled_index = np.flatnonzero(~labeled)
+    weights = samples_weights.copy()
+    similarity = 1 / (1 + pairwise_distances(X, X[labeled]).min(axis=1))
+    selected = []
+    for i in range(batch_size):
+        alpha = (unlabeled_index.shape[0] - i) / X.shape[0]
+        scores = (alpha * (1 - similarity[unlabeled_index])
+                  + (1 - alpha) * weights[unlabeled_index])
+        scores[np.isin(unlabeled_index, selected)] = -np.inf
+        best = unlabeled_index[np.argmax(scores)]
+        selected.append(best)
+        similarity = np.maximum(
+            similarity, 1 / (1 + pairwise_distances(X, X[[best]])[:, 0]))
+        weights[best] = 0.
+    return np.array(selected)
+
+
+def test_ranked_batch():
+    rng = np.random.RandomState(0)
+    X = rng.rand(200, 5)
+    samples_weights = rng.rand(200)
+    samples_weights[:20] = -1
+
+    sampler = RankedBatchSampler(15)
+    selected = sampler.select_samples(X, samples_weights)
+
+    assert_array_equal(selected,
+                       _naive_ranked_batch(X, samples_weights, 15))
+    assert np.unique(selected).shape[0] == 15
+    assert np.all(samples_weights[selected] >= 0)
+
+    with pytest.warns(DeprecationWarning):
+        assert_array_equal(
+            sampler.select_samples(X, samples_weights=samples_weights),
+            selected)
+
+
+def test_ranked_batch_neighbors():
+    rng = np.random.RandomState(0)
+    X = rng.rand(300, 3)
+    samples_weights = rng.rand(300)
+    samples_weights[:20] = -1
+
+    expected = RankedBatchSampler(10).select_samples(X, samples_weights)
+    for neighbors in ['kd_tree', 'ball_tree']:
+        sampler = RankedBatchSampler(10, neighbors=neighbors)
+        assert_array_equal(sampler.select_samples(X, samples_weights),
+                           expected)
+
+    # Warm started index must give the same results as a fresh one
+    sampler = RankedBatchSampler(10, neighbors='kd_tree', warm_start=True)
+    for _ in range(5):
+        selected = sampler.select_samples(X, samples_weights)
+        assert_array_equal(
+            selected, RankedBatchSampler(10).select_samples(
+                X, samples_weights))
+        samples_weights[selected] = -1
+
+    sampler = RankedBatchSampler(10, neighbors='random_projection')
+    assert np.unique(sampler.select_samples(X, samples_weights)).shape[0] == 10
+
+
+def test_ranked_batch_not_enough_unlabeled():
+    X = np.random.RandomState(0).rand(10, 2)
+    pool = ActiveLearningPool(X, labeled=np.arange(7))
+
+    with pytest.warns(NotEnoughSamplesWarning):
+        selected = RankedBatchSampler(5).select_samples(pool)
+    assert_array_equal(selected, [7, 8, 9])
@@ -0,0 +1,58 @@
+import numpy as np
+from numpy.testing import assert_array_equal
+
+from cardinal.clustering import KMeansSampler, MiniBatchKMeansSampler
+
+
+def test_sparse_assignment_matches_exact():
+    rng = np.random.RandomState(0)
+
+    for _ in range(5):
+        X = rng.rand(300, 4)
+        exact = KMeansSampler(12, n_init=1, random_state=0)
+        sparse = KMeansSampler(12, assignment='sparse', chunk_size=50,
+                               n_init=1, random_state=0)
+        selected = sparse.select_samples(X)
+        assert_array_equal(selected, exact.select_samples(X))
+
+    # With few candidates, the assignment is approximate but still valid
+    sampler = KMeansSampler(12, assignment='sparse', n_candidates=1,
+                            chunk_size=50, n_init=1, random_state=0)
+    selected = sampler.select_samples(X)
+    assert np.unique(selected).shape[0] == 12
+
+
+def test_warm_start():
+    rng = np.random.RandomState(0)
+    X = rng.rand(500, 4)
+
+    sampler = KMeansSampler(10, warm_start=True, warm_start_max_iter=5,
+                            n_init=1, random_state=0)
+    mask = np.zeros(X.shape[0], dtype=bool)
+    for _ in range(3):
+        index = np.flatnonzero(~mask)
+        selected = sampler.select_samples(X[index])
+        assert np.unique(selected).shape[0] == 10
+        mask[index[selected]] = True
+    assert sampler.clustering_.max_iter == 5
+    assert sampler.clustering_.n_iter_ <= 5
+    # The estimator given by the user keeps its parameters
+    assert sampler.clustering is not sampler.clustering_
+    assert sampler.clustering.init == 'k-means++'
+    assert sampler.clustering.max_iter == 300
+
+    # Warm start can be turned off between iterations
+    sampler.warm_start = False
+    sampler.select_samples(X)
+    assert sampler.clustering_ is sampler.clustering
+
+    sampler = MiniBatchKMeansSampler(10, warm_start=True, incremental=True,
+                                     chunk_size=100, random_state=0)
+    for _ in range(2):
+        selected = sampler.select_samples(X)
+        assert np.unique(selected).shape[0] == 10
+
+    # Chunks smaller than the number of clusters are enlarged
+    sampler = MiniBatchKMeansSampler(10, incremental=True, chunk_size=5,
+                                     random_state=0)
+    assert np.unique(sampler.select_samples(X)).shape[0] == 10
@@ -0,0 +1,56 @@
+import numpy as np
+from numpy.testing import assert_array_equal
+from scipy import sparse
+from sklearn.metrics import pairwise_distances
+
+from cardinal.coreset import CoresetSampler
+from cardinal.pool import ActiveLearningPool
+
+
+def _naive_k_center(X_labeled, X, k):
+    distances = pairwise_distances(X, X_labeled).min(axis=1)
+    selected = []
+    for _ in range(k):
+        idx = np.argmax(distances)
+        selected.append(idx)
+        distances = np.minimum(distances,
+                               pairwise_distances(X, X[[idx]])[:, 0])
+    return np.array(selected)
+
+
+def test_coreset_sampler():
+    rng = np.random.RandomState(0)
+    X = rng.rand(1000, 8)
+    labeled = rng.choice(1000, 20, replace=False)
+    mask = np.zeros(1000, dtype=bool)
+    mask[labeled] = True
+
+    expected = _naive_k_center(X[mask], X[~mask], 15)
+    for kwargs in [{'dtype': np.float64}, {'chunk_size': 64}]:
+        sampler = CoresetSampler(15, **kwargs).fit(X[mask])
+        assert_array_equal(sampler.select_samples(X[~mask]), expected)
+
+    # Pools and sparse pools
+    pool = ActiveLearningPool(X, labeled=labeled)
+    sampler = CoresetSampler(15, dtype=np.float64).fit(X[mask])
+    assert_array_equal(sampler.select_samples(pool),
+                       np.flatnonzero(~mask)[expected])
+    sampler = CoresetSampler(15, dtype=np.float64, chunk_size=100)
+    selected = sampler.fit(sparse.csr_matrix(X[mask])).select_samples(
+        sparse.csr_matrix(X[~mask]))
+    assert_array_equal(selected, expected)
+
+    # Without labeled samples and with a random projection
+    for random_state in [0, np.random.default_rng(0)]:
+        sampler = CoresetSampler(15, n_components=4,
+                                 random_state=random_state)
+        selected = sampler.fit(X[:0]).select_samples(X)
+        assert np.unique(selected).shape[0] == 15
+
+    # The projected pool is computed once, the greedy runs on it
+    sampler = CoresetSampler(15, n_components=4, dtype=np.float64,
+                             chunk_size=64, random_state=0).fit(X[mask])
+    components = sampler.components_
+    assert_array_equal(
+        sampler.select_samples(X[~mask]),
+        _naive_k_center(X[mask] @ components, X[~mask] @ components, 15))
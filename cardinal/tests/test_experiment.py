@@ -0,0 +1,84 @@
+from functools import partial
+
+import numpy as np
+from numpy.testing import assert_array_equal
+from sklearn.datasets import make_classification
+from sklearn.linear_model import LogisticRegression
+
+from cardinal.experiment import (active_learning_loop, load_checkpoint,
+                                 results_to_curves, run_experiments)
+from cardinal.metrics import ContradictionMonitor
+from cardinal.random import RandomSampler
+from cardinal.uncertainty import MarginSampler
+
+
+def _margin_sampler(seed):
+    return MarginSampler(LogisticRegression(), 5)
+
+
+def _model(seed):
+    return LogisticRegression()
+
+
+def test_run_experiments():
+    X, y = make_classification(200, n_features=5, n_classes=3,
+                               n_informative=3, random_state=0)
+    samplers = {'margin': _margin_sampler,
+                'random': partial(RandomSampler, 5)}
+    records = run_experiments(X, y, samplers, _model, [0, 1], n_iter=4)
+    assert len(records) == 2 * 2 * 4
+    curves = results_to_curves(records)
+    assert list(curves) == ['margin', 'random']
+    x, values = curves['margin']
+    assert_array_equal(x, [3, 8, 13, 18])
+    assert values.shape == (2, 4)
+
+    # Parallel runs give the same results
+    parallel = run_experiments(X, y, samplers, _model, [0, 1],
+                               n_iter=4, n_jobs=2)
+    for name in samplers:
+        assert_array_equal(results_to_curves(parallel)[name][1],
+                           curves[name][1])
+
+
+def test_checkpoint(tmp_path):
+    X, y = make_classification(200, n_features=5, n_classes=3,
+                               n_informative=3, random_state=0)
+    X_train, X_test, y_train, y_test = X[:150], X[150:], y[:150], y[150:]
+    _, labeled = np.unique(y_train, return_index=True)
+
+    def run(n_iter, checkpoint=None):
+        monitor = ContradictionMonitor()
+        sampler = RandomSampler(5, random_state=np.random.RandomState(0))
+        results = active_learning_loop(
+            sampler, LogisticRegression(), X_train, y_train, X_test, y_test,
+            labeled, n_iter, monitors=[monitor], checkpoint=checkpoint)
+        return results
+
+    expected = run(5)
+
+    # Interrupt after 3 iterations then resume
+    checkpoint = str(tmp_path / 'loop.npz')
+    run(3, checkpoint)
+    state = load_checkpoint(checkpoint)
+    assert state['iteration'] == 3
+    assert state['labeled_mask'].sum() == 3 + 3 * 5
+    assert len(state['monitors'][0].values) == 2
+
+    results = run(5, checkpoint)
+    assert results['accuracy'] == expected['accuracy']
+    for selected, expected_selected in zip(results['selected'],
+                                           expected['selected']):
+        assert_array_equal(selected, expected_selected)
+    assert len(load_checkpoint(checkpoint)['monitors'][0].values) == 4
+
+    # Profiled samplers can be checkpointed too
+    checkpoint = str(tmp_path / 'profiled.npz')
+    sampler = RandomSampler(5, random_state=0).enable_profiling()
+    active_learning_loop(sampler, LogisticRegression(), X_train, y_train,
+                         X_test, y_test, labeled, 2, checkpoint=checkpoint)
+    profile = load_checkpoint(checkpoint)['sampler'].profile_
+    assert profile.stages['select']['calls'] == 2
+    with profile.stage('select'):
+        pass
+    assert profile.stages['select']['calls'] == 3
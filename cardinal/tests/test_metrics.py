@@ -0,0 +1,102 @@
+import tracemalloc
+
+import numpy as np
+from numpy.testing import assert_allclose
+
+from sklearn.metrics import pairwise_distances
+
+from cardinal.metrics import (AccuracyMonitor, ConfidenceDriftMonitor,
+                              ContradictionMonitor, ExplorationMonitor,
+                              LabelDistributionMonitor, MonitorSet)
+
+
+def test_contradiction_monitor(tmp_path):
+    rng = np.random.RandomState(0)
+    probas = [rng.dirichlet(np.ones(4), size=1000) for _ in range(4)]
+    expected = [np.abs(b - a).sum() for a, b in zip(probas, probas[1:])]
+
+    monitor = ContradictionMonitor(chunk_size=64)
+    for i, p in enumerate(probas):
+        monitor.accumulate(10 * i, p)
+    assert_allclose(monitor.values, expected)
+    assert monitor.get()['n_samples'] == [10, 20, 30]
+
+    # Chunked predictions stored in float32 or in a memmap
+    for kwargs in [{'dtype': np.float32},
+                   {'memmap_path': str(tmp_path / 'probas.dat')}]:
+        monitor = ContradictionMonitor(**kwargs)
+        for i, p in enumerate(probas):
+            monitor.accumulate(10 * i, (p[j:j + 300]
+                                        for j in range(0, 1000, 300)))
+        assert_allclose(monitor.values, expected, rtol=1e-5)
+    assert isinstance(monitor.last_probas_test, np.memmap)
+    assert_allclose(monitor.last_probas_test, probas[-1])
+
+
+def test_contradiction_monitor_memory():
+    probas = np.random.RandomState(0).dirichlet(np.ones(4), size=100000)
+    monitor = ContradictionMonitor(dtype=np.float32, chunk_size=1000)
+
+    tracemalloc.start()
+    monitor.accumulate(10, probas)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    # The float32 copy is written in place, without concatenating chunks
+    copy_size = probas.size * 4
+    assert peak < 1.2 * copy_size
+    assert monitor.last_probas_test.dtype == np.float32
+    assert_allclose(monitor.last_probas_test, probas, rtol=1e-6)
+
+
+def test_monitor_set():
+    rng = np.random.RandomState(0)
+    X_test = rng.rand(300, 5)
+    y_test = rng.randint(3, size=300)
+    probas = [rng.dirichlet(np.ones(3), size=300) for _ in range(3)]
+    batches = [rng.rand(10, 5) for _ in range(3)]
+
+    monitors = MonitorSet({
+        'contradiction': ContradictionMonitor(),
+        'accuracy': AccuracyMonitor(y_test),
+        'confidence': ConfidenceDriftMonitor(),
+        'labels': LabelDistributionMonitor(3),
+        'exploration': ExplorationMonitor(X_test),
+    }, chunk_size=64)
+    for i, (p, batch) in enumerate(zip(probas, batches)):
+        # Predictions given by chunks, as from a chunked inference
+        monitors.accumulate(10 * (i + 1), (p[j:j + 100]
+                                           for j in range(0, 300, 100)),
+                            X_selected=batch)
+
+    results = monitors.get()
+    assert_allclose(results['contradiction']['contradictions'],
+                    [np.abs(b - a).sum() for a, b in zip(probas, probas[1:])])
+    assert_allclose(results['accuracy']['accuracies'],
+                    [np.mean(p.argmax(axis=1) == y_test) for p in probas])
+    confidences = [p.max(axis=1).mean() for p in probas]
+    assert_allclose(results['confidence']['confidences'], confidences)
+    assert_allclose(results['confidence']['confidence_drifts'],
+                    np.diff(confidences))
+    distributions = [np.bincount(p.argmax(axis=1), minlength=3) / 300
+                     for p in probas]
+    assert_allclose(results['labels']['distributions'], distributions)
+    assert_allclose(results['labels']['distances'][0],
+                    .5 * np.abs(distributions[1] - distributions[0]).sum())
+    assert_allclose(results['exploration']['explorations'][-1],
+                    pairwise_distances(np.vstack(batches), X_test).mean())
+    assert results['accuracy']['n_samples'] == [10, 20, 30]
+
+
+def test_exploration_monitor():
+    rng = np.random.RandomState(0)
+    X_test = rng.rand(100, 4)
+    batches = [rng.rand(n, 4) for n in [7, 10, 10]]
+
+    monitor = ExplorationMonitor(X_test, block_size=8)
+    for i, batch in enumerate(batches):
+        monitor.accumulate(i, batch)
+        distances = pairwise_distances(np.vstack(batches[:i + 1]), X_test)
+        assert_allclose(monitor.values[-1], distances.mean())
+        assert_allclose(monitor.min_values[-1], distances.min(axis=0).mean())
+    assert_allclose(monitor.min_distances_, distances.min(axis=0))
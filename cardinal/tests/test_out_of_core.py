@@ -0,0 +1,115 @@
+import numpy as np
+from numpy.testing import assert_array_equal
+
+from cardinal.batch import RankedBatchSampler
+from cardinal.clustering import KMeansSampler, MiniBatchKMeansSampler
+from cardinal.pool import ActiveLearningPool
+from cardinal.uncertainty import MarginSampler
+from cardinal.utils import is_out_of_core
+
+
+class ChunkedArray:
+    """Chunked array refusing reads of more than max_rows rows."""
+
+    def __init__(self, X, max_rows):
+        self.X = X
+        self.shape = X.shape
+        self.max_rows = max_rows
+
+    def __getitem__(self, key):
+        rows = self.X[key]
+        assert rows.shape[0] <= self.max_rows
+        return rows
+
+
+class DataFrameLike:
+    """Table whose __getitem__ selects columns, like a pandas DataFrame."""
+
+    def __init__(self, X):
+        self.X = X
+        self.shape = X.shape
+        self.columns = np.arange(X.shape[1])
+        self.iloc = X
+
+    def __getitem__(self, key):
+        return self.X[:, key]
+
+    def __array__(self, dtype=None, copy=None):
+        return self.X if dtype is None else self.X.astype(dtype)
+
+
+def test_out_of_core_samplers():
+    rng = np.random.RandomState(0)
+    X = rng.dirichlet(np.ones(3), size=1000)
+    X_chunked = ChunkedArray(X, 100)
+    assert is_out_of_core(X_chunked)
+
+    sampler = MarginSampler('precomputed', 10, chunk_size=100)
+    assert_array_equal(sampler.select_samples(X_chunked),
+                       MarginSampler('precomputed', 10).select_samples(X))
+
+    weights = rng.rand(1000)
+    weights[:50] = -1
+    sampler = RankedBatchSampler(10, chunk_size=100)
+    assert_array_equal(sampler.select_samples(X_chunked, weights),
+                       RankedBatchSampler(10).select_samples(X, weights))
+
+    sampler = MiniBatchKMeansSampler(10, chunk_size=100, random_state=0)
+    selected = sampler.select_samples(X_chunked)
+    assert np.unique(selected).shape[0] == 10
+
+    # Unlabeled samples of an out-of-core pool are read by chunks too
+    pool = ActiveLearningPool(X_chunked, labeled=np.arange(0, 1000, 3),
+                              chunk_size=50)
+    selected = MiniBatchKMeansSampler(
+        10, chunk_size=50, random_state=0).select_samples(pool)
+    assert not np.any(pool.labeled_mask[selected])
+
+
+def test_out_of_core_kmeans(tmp_path):
+    # KMeans has no partial_fit, out-of-core pools are loaded in memory
+    rng = np.random.RandomState(0)
+    X = rng.rand(200, 3)
+    path = str(tmp_path / 'X.npy')
+    np.save(path, X)
+    labeled = np.arange(0, 200, 4)
+
+    pool = ActiveLearningPool.from_npy(path, labeled=labeled)
+    assert is_out_of_core(pool.X)
+    selected = KMeansSampler(5, n_init=1, random_state=0).select_samples(pool)
+
+    in_memory = ActiveLearningPool(X, labeled=labeled)
+    assert_array_equal(
+        selected,
+        KMeansSampler(5, n_init=1, random_state=0).select_samples(in_memory))
+    assert not np.any(pool.labeled_mask[selected])
+
+    assert_array_equal(
+        KMeansSampler(5, n_init=1, random_state=0).select_samples(pool.X),
+        KMeansSampler(5, n_init=1, random_state=0).select_samples(X))
+
+
+def test_dataframe_not_out_of_core():
+    rng = np.random.RandomState(0)
+    X = rng.dirichlet(np.ones(3), size=200)
+    X_frame = DataFrameLike(X)
+    assert not is_out_of_core(X_frame)
+
+    sampler = MarginSampler('precomputed', 10)
+    assert_array_equal(sampler.select_samples(X_frame),
+                       MarginSampler('precomputed', 10).select_samples(X))
+
+    sampler = MiniBatchKMeansSampler(10, random_state=0)
+    assert_array_equal(
+        sampler.select_samples(X_frame),
+        MiniBatchKMeansSampler(10, random_state=0).select_samples(X))
+    sampler = KMeansSampler(10, assignment='sparse', chunk_size=50, n_init=1,
+                            random_state=0)
+    assert_array_equal(
+        sampler.select_samples(X_frame),
+        KMeansSampler(10, n_init=1, random_state=0).select_samples(X))
+
+    weights = rng.rand(200)
+    weights[:20] = -1
+    assert_array_equal(RankedBatchSampler(10).select_samples(X_frame, weights),
+                       RankedBatchSampler(10).select_samples(X, weights))
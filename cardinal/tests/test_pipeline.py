@@ -0,0 +1,101 @@
+import numpy as np
+import pytest
+from numpy.testing import assert_array_equal
+
+from cardinal.batch import RankedBatchSampler
+from cardinal.clustering import KMeansSampler
+from cardinal.coreset import CoresetSampler
+from cardinal.pipeline import SamplerPipeline
+from cardinal.pool import ActiveLearningPool
+from cardinal.uncertainty import MarginSampler
+from cardinal.zhdanov2019 import TwoStepKMeansSampler
+
+
+def test_sampler_pipeline():
+    rng = np.random.RandomState(0)
+    proba = rng.dirichlet(np.ones(3), size=1000)
+    labeled = rng.choice(1000, 30, replace=False)
+    mask = np.zeros(1000, dtype=bool)
+    mask[labeled] = True
+
+    def make_pipeline():
+        return SamplerPipeline([
+            ('margin', MarginSampler('precomputed', 200)),
+            ('coreset', CoresetSampler(50, dtype=np.float64)),
+            ('kmeans', KMeansSampler(10, random_state=0, n_init=1)),
+        ]).fit(proba[mask])
+
+    # Same as running the samplers by hand on sorted preselections
+    X = proba[~mask]
+    first = np.sort(MarginSampler('precomputed', 200).select_samples(X))
+    second = np.sort(first[CoresetSampler(50, dtype=np.float64).fit(
+        proba[mask]).select_samples(X[first])])
+    expected = second[KMeansSampler(10, random_state=0, n_init=1)
+                      .select_samples(X[second])]
+    pipeline = make_pipeline()
+    assert_array_equal(pipeline.select_samples(X), expected)
+    assert_array_equal(np.sort(pipeline.selected_['coreset']), second)
+
+    # Indices are mapped back to the pool
+    pool = ActiveLearningPool(proba, labeled=labeled)
+    assert_array_equal(make_pipeline().select_samples(pool),
+                       np.flatnonzero(~mask)[expected])
+
+    with pytest.raises(ValueError):
+        SamplerPipeline([('margin', MarginSampler('precomputed', 5)),
+                         ('kmeans', KMeansSampler(10))])
+
+
+def test_ranked_batch_pipeline():
+    rng = np.random.RandomState(0)
+    proba = rng.dirichlet(np.ones(3), size=500)
+    weights = rng.rand(500)
+
+    def make_pipeline():
+        return SamplerPipeline([
+            ('margin', MarginSampler('precomputed', 50)),
+            ('ranked_batch', RankedBatchSampler(5)),
+        ])
+
+    # Later stages are given no labeled sample, all their samples are
+    # unlabeled
+    first = np.sort(MarginSampler('precomputed', 50).select_samples(proba))
+    for sample_weight in [None, weights]:
+        stage_weight = (None if sample_weight is None
+                        else sample_weight[first])
+        expected = first[RankedBatchSampler(5).select_samples(
+            proba[first], sample_weight=stage_weight)]
+        selected = make_pipeline().select_samples(
+            proba, sample_weight=sample_weight)
+        assert_array_equal(selected, expected)
+        assert np.unique(selected).shape[0] == 5
+
+    pool = ActiveLearningPool(proba, labeled=np.arange(20))
+    selected = make_pipeline().select_samples(pool)
+    assert np.unique(selected).shape[0] == 5
+    assert not np.any(pool.labeled_mask[selected])
+
+
+def test_two_step_budget():
+    rng = np.random.RandomState(0)
+    proba = rng.dirichlet(np.ones(3), size=5000)
+
+    sampler = TwoStepKMeansSampler(4, 'precomputed', 10, max_seconds=10.,
+                                   random_state=0, n_init=1)
+    sampler.select_samples(proba)
+    assert sampler.preselection_size_ == 40
+
+    # A large budget allows to preselect the whole pool
+    sampler.select_samples(proba)
+    assert sampler.preselection_size_ == 5000
+
+    # A tiny budget reduces the preselection to the batch size
+    sampler.max_seconds = 1e-9
+    selected = sampler.select_samples(proba)
+    assert sampler.preselection_size_ == 10
+    assert np.unique(selected).shape[0] == 10
+
+    # Without budget, the default preselection size is restored
+    sampler.max_seconds = None
+    sampler.select_samples(proba)
+    assert sampler.preselection_size_ == 40
@@ -0,0 +1,68 @@
+import numpy as np
+import pytest
+from numpy.testing import assert_array_equal
+
+from cardinal.batch import RankedBatchSampler
+from cardinal.clustering import KMeansSampler
+from cardinal.pool import ActiveLearningPool
+from cardinal.random import RandomSampler
+from cardinal.submodularity import SubmodularSampler
+from cardinal.uncertainty import MarginSampler
+
+
+def test_pool():
+    rng = np.random.RandomState(0)
+    proba = rng.dirichlet(np.ones(3), size=500)
+    labeled = rng.choice(500, 50, replace=False)
+    pool = ActiveLearningPool(proba, labeled=labeled, chunk_size=64)
+    mask = pool.labeled_mask.copy()
+    assert pool.n_labeled == 50 and pool.n_unlabeled == 450
+
+    # Selection on the pool matches the selection on the unlabeled copy
+    expected = np.flatnonzero(~mask)[
+        MarginSampler('precomputed', 10).select_samples(proba[~mask])]
+    for n_jobs in [1, 2]:
+        sampler = MarginSampler('precomputed', 10, n_jobs=n_jobs)
+        assert_array_equal(sampler.select_samples(pool), expected)
+
+    expected = np.flatnonzero(~mask)[
+        KMeansSampler(5, random_state=0, n_init=1).select_samples(
+            proba[~mask])]
+    selected = KMeansSampler(5, random_state=0, n_init=1).select_samples(pool)
+    assert_array_equal(selected, expected)
+
+    weights = np.zeros(500)
+    weights[mask] = -1
+    assert_array_equal(
+        RankedBatchSampler(5).select_samples(pool),
+        RankedBatchSampler(5).select_samples(proba, weights))
+
+    selected = RandomSampler(10, random_state=0).select_samples(pool)
+    assert not np.any(mask[selected])
+
+    pool.label(selected)
+    assert pool.n_unlabeled == 440
+    assert not np.any(np.isin(selected, pool.unlabeled_index))
+
+    # Labels cannot be stored in a pool created without y
+    with pytest.raises(ValueError):
+        pool.label(selected, np.zeros(10))
+    pool = ActiveLearningPool(proba, y=np.zeros(500), labeled=labeled)
+    pool.label(selected, np.ones(10))
+    assert_array_equal(pool.y[selected], 1)
+
+    # A precomputed matrix cannot be restricted to unlabeled samples
+    with pytest.raises(ValueError):
+        SubmodularSampler(5, metric='precomputed').select_samples(pool)
+
+
+def test_pool_from_npy(tmp_path):
+    X = np.arange(20.).reshape(10, 2)
+    np.save(tmp_path / 'X.npy', X)
+    pool = ActiveLearningPool.from_npy(str(tmp_path / 'X.npy'),
+                                       labeled=[2, 3], chunk_size=3)
+    assert isinstance(pool.X, np.memmap)
+    chunks = list(pool.iter_unlabeled())
+    assert_array_equal(np.concatenate(chunks), X[[0, 1, 4, 5, 6, 7, 8, 9]])
+    # Contiguous chunks are views on the memory map
+    assert np.shares_memory(chunks[1], pool.X)
@@ -0,0 +1,39 @@
+import numpy as np
+from numpy.testing import assert_array_equal
+
+from cardinal.random import (RandomSampler, reservoir_sample,
+                             sample_without_replacement)
+
+
+def test_sample_without_replacement():
+    rng = np.random.default_rng(0)
+    counts = np.zeros(20)
+    for _ in range(2000):
+        selected = sample_without_replacement(20, 5, rng)
+        assert np.unique(selected).shape[0] == 5
+        counts[selected] += 1
+    # Each integer is drawn with probability 1 / 4
+    assert np.all(np.abs(counts / 2000 - .25) < .05)
+
+    counts = np.zeros(20)
+    for _ in range(2000):
+        selected = reservoir_sample([3, 7, 1, 9], 5, rng)
+        assert np.unique(selected).shape[0] == 5
+        counts[selected] += 1
+    assert np.all(np.abs(counts / 2000 - .25) < .05)
+
+    assert_array_equal(reservoir_sample([2, 1], 5, rng), [0, 1, 2])
+
+
+def test_random_sampler():
+    X = np.zeros((1000, 2))
+    selected = RandomSampler(10, random_state=0).fit().select_samples(X)
+    assert_array_equal(
+        selected, RandomSampler(10, random_state=0).fit().select_samples(X))
+    assert np.unique(selected).shape[0] == 10
+
+    sampler = RandomSampler(10, random_state=np.random.default_rng(0))
+    chunks = (X[i:i + 64] for i in range(0, 1000, 64))
+    selected = sampler.select_samples_iter(chunks)
+    assert np.unique(selected).shape[0] == 10
+    assert selected.max() < 1000
@@ -0,0 +1,80 @@
+import numpy as np
+import pytest
+from numpy.testing import assert_array_equal
+from scipy import sparse
+
+from cardinal.batch import RankedBatchSampler
+from cardinal.clustering import KMeansSampler
+from cardinal.pool import ActiveLearningPool
+from cardinal.random import RandomSampler
+from cardinal.submodularity import SubmodularSampler
+from cardinal.uncertainty import MarginSampler
+from cardinal.zhdanov2019 import TwoStepKMeansSampler
+
+
+class ConstantClassifier:
+
+    def fit(self, X, y=None):
+        return self
+
+    def predict_proba(self, X):
+        assert sparse.issparse(X)
+        proba = np.asarray(X[:, :3].todense()) + 1e-3
+        return proba / proba.sum(axis=1, keepdims=True)
+
+
+def test_sparse_pool():
+    X = sparse.random(300, 1000, density=.01, format='csr', random_state=0)
+    X_dense = X.toarray()
+    weights = np.zeros(300)
+    weights[:10] = -1
+
+    for metric in ['euclidean', 'cosine']:
+        for neighbors in ['brute', 'random_projection']:
+            if metric == 'cosine' and neighbors == 'random_projection':
+                continue
+            sampler = RankedBatchSampler(5, metric=metric,
+                                         neighbors=neighbors)
+            selected = sampler.select_samples(X, weights)
+            assert np.unique(selected).shape[0] == 5
+            if neighbors == 'brute':
+                assert_array_equal(
+                    selected, RankedBatchSampler(5, metric=metric)
+                    .select_samples(X_dense, weights))
+
+    # Trees require dense samples
+    for neighbors in ['kd_tree', 'ball_tree']:
+        with pytest.raises(TypeError):
+            RankedBatchSampler(5, neighbors=neighbors).select_samples(
+                X, weights)
+
+    expected = MarginSampler(ConstantClassifier(), 5,
+                             assume_fitted=True).select_samples(X)
+    for chunk_size, n_jobs in [(64, 1), (64, 2)]:
+        sampler = MarginSampler(ConstantClassifier(), 5, assume_fitted=True,
+                                chunk_size=chunk_size, n_jobs=n_jobs)
+        assert_array_equal(sampler.select_samples(X), expected)
+
+    sampler = KMeansSampler(5, assignment='sparse', chunk_size=64,
+                            n_init=1, random_state=0)
+    assert np.unique(sampler.select_samples(X)).shape[0] == 5
+
+    sampler = SubmodularSampler(5, metric='cosine', optimizer='lazy')
+    assert_array_equal(
+        sampler.select_samples(X), sampler.select_samples(X_dense))
+    sampler = SubmodularSampler(5, n_neighbors=10, optimizer='lazy')
+    assert np.unique(sampler.select_samples(X)).shape[0] == 5
+
+    sampler = TwoStepKMeansSampler(3, ConstantClassifier(), 5,
+                                   assume_fitted=True, n_init=1)
+    assert np.unique(sampler.select_samples(X)).shape[0] == 5
+
+    pool = ActiveLearningPool(X, labeled=np.arange(10), chunk_size=64)
+    for sampler in [RandomSampler(5, random_state=0),
+                    RankedBatchSampler(5),
+                    KMeansSampler(5, n_init=1, random_state=0),
+                    TwoStepKMeansSampler(3, ConstantClassifier(), 5,
+                                         assume_fitted=True, n_init=1)]:
+        selected = sampler.select_samples(pool)
+        assert np.unique(selected).shape[0] == 5
+        assert not np.any(pool.labeled_mask[selected])
@@ -0,0 +1,81 @@
+import numpy as np
+import pytest
+from numpy.testing import assert_allclose, assert_array_equal
+from sklearn.metrics import pairwise_distances
+
+from cardinal.submodularity import (SubmodularSampler, facility_location,
+                                    knn_similarity_graph)
+
+
+def test_knn_similarity_graph():
+    rng = np.random.RandomState(0)
+    X = rng.rand(50, 3)
+    similarities = 1 / (1 + pairwise_distances(X))
+
+    graph = knn_similarity_graph(X, 50, chunk_size=7)
+    assert_allclose(graph.toarray(), similarities)
+
+    graph = knn_similarity_graph(X, 5, chunk_size=7)
+    assert np.all(graph.getnnz(axis=1) >= 5)
+    assert_allclose(graph.diagonal(), 1)
+    assert_allclose(graph.toarray(), graph.toarray().T)
+    assert_allclose(graph.data, similarities[graph.nonzero()])
+
+
+def test_sparse_submodular():
+    pytest.importorskip('apricot')
+    rng = np.random.RandomState(0)
+    X = rng.rand(500, 3)
+
+    sampler = SubmodularSampler(10, n_neighbors=20, chunk_size=100)
+    selected = sampler.select_samples(X)
+    assert np.unique(selected).shape[0] == 10
+
+
+def _naive_facility_location(similarities, n_select):
+    current = np.zeros(similarities.shape[0])
+    selected = []
+    for _ in range(n_select):
+        gains = np.maximum(similarities - current[:, None], 0).sum(axis=0)
+        best = np.argmax(gains)
+        selected.append(best)
+        current = np.maximum(current, similarities[:, best])
+    return np.array(selected)
+
+
+def test_native_facility_location():
+    rng = np.random.RandomState(0)
+    X = rng.rand(200, 3)
+    similarities = 1 / (1 + pairwise_distances(X))
+    expected = _naive_facility_location(similarities, 10)
+
+    assert_array_equal(facility_location(similarities, 10), expected)
+    for block_size in [1, 17]:
+        assert_array_equal(
+            facility_location(X, 10, metric='euclidean',
+                              block_size=block_size),
+            expected)
+
+    graph = knn_similarity_graph(X, 10)
+    assert_array_equal(
+        facility_location(graph, 10, block_size=17),
+        _naive_facility_location(graph.toarray(), 10))
+
+    selected = facility_location(X, 10, metric='euclidean',
+                                 optimizer='stochastic', random_state=0)
+    assert np.unique(selected).shape[0] == 10
+
+    sampler = SubmodularSampler(10, optimizer='lazy')
+    assert_array_equal(sampler.select_samples(X), expected)
+
+
+def test_submodular_modes_agree():
+    pytest.importorskip('apricot')
+    rng = np.random.RandomState(0)
+    X = rng.rand(300, 2)
+
+    expected = SubmodularSampler(10, optimizer='lazy').select_samples(X)
+    # A graph with all the neighbors is the dense similarity matrix
+    for kwargs in [{}, {'n_neighbors': 300}]:
+        selected = SubmodularSampler(10, **kwargs).select_samples(X)
+        assert_array_equal(selected, expected)
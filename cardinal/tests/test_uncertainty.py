@@ -3,6 +3,9 @@ import pytest
 from numpy.testing import assert_array_equal
 
 from cardinal.uncertainty import ConfidenceSampler, MarginSampler, EntropySampler
+from cardinal.uncertainty import ProbaCache, uncertainty_scores
+from cardinal.uncertainty import UNCERTAINTY_KINDS
+from cardinal.pool import ActiveLearningPool
 
 
 def test_all_uncertainty():
@@ -49,3 +52,107 @@ def test_types():
     ConfidenceSampler(WithAllMethods(), 1)
     with pytest.raises(TypeError):
         ConfidenceSampler(MissingMethods(), 1)
+
+
+class CountingClassifier:
+
+    def __init__(self, proba):
+        self.proba = proba
+        self.n_calls = 0
+
+    def fit(self, X, y=None):
+        return self
+
+    def predict_proba(self, X):
+        self.n_calls += 1
+        return self.proba
+
+
+def test_fused_uncertainty():
+    proba = np.array([[0.10, 0.20, 0.30, 0.40],
+                      [0.00, 0.05, 0.45, 0.50],
+                      [0.15, 0.45, 0.20, 0.20]])
+
+    scores = uncertainty_scores('precomputed', proba, block_size=2)
+    assert_array_equal(np.argmax(scores['confidence']), 0)
+    assert_array_equal(np.argmax(scores['margin']), 1)
+    assert_array_equal(np.argmax(scores['entropy']), 2)
+
+    with pytest.raises(ValueError):
+        uncertainty_scores('precomputed', proba, ['variance'])
+
+    classifier = CountingClassifier(proba)
+    cache = ProbaCache(classifier)
+    X = np.zeros((3, 2))
+    for sampler_class, expected in [(ConfidenceSampler, 0),
+                                    (MarginSampler, 1),
+                                    (EntropySampler, 2)]:
+        sampler = sampler_class(cache, 1, assume_fitted=True)
+        assert_array_equal(sampler.select_samples(X), [expected])
+    assert classifier.n_calls == 1
+
+    cache.fit(X, None)
+    cache.predict_proba(X)
+    assert classifier.n_calls == 2
+
+
+class ChunkCountingClassifier(CountingClassifier):
+
+    def predict_proba(self, X):
+        self.n_calls += 1
+        return self.proba[np.asarray(X[:, 0], dtype=int)]
+
+
+def test_fused_uncertainty_pool():
+    rng = np.random.RandomState(0)
+    proba = rng.dirichlet(np.ones(3), size=40)
+    # The first feature is the row of the sample, read back by the classifier
+    X = np.column_stack([np.arange(40), rng.rand(40)])
+    labeled = rng.choice(40, 8, replace=False)
+    pool = ActiveLearningPool(X, labeled=labeled, chunk_size=8)
+    unlabeled = pool.unlabeled_index
+
+    classifier = ChunkCountingClassifier(proba)
+    cache = ProbaCache(classifier)
+    for sampler_class in [ConfidenceSampler, MarginSampler, EntropySampler]:
+        sampler = sampler_class(cache, 3, assume_fitted=True)
+        expected = sampler_class('precomputed', 3).select_samples(
+            proba[unlabeled])
+        assert_array_equal(np.sort(sampler.select_samples(pool)),
+                           np.sort(unlabeled[expected]))
+    # The 32 unlabeled samples are scored in 4 chunks, each queried once
+    assert classifier.n_calls == 4
+
+    scores = uncertainty_scores(cache, pool, block_size=8)
+    expected = uncertainty_scores('precomputed', proba[unlabeled])
+    for kind in UNCERTAINTY_KINDS:
+        np.testing.assert_allclose(scores[kind], expected[kind])
+    assert classifier.n_calls == 4
+
+    # Labeling samples invalidates the cached chunks
+    pool.label(unlabeled[:2])
+    ConfidenceSampler(cache, 3, assume_fitted=True).select_samples(pool)
+    assert classifier.n_calls == 8
+
+
+def test_proba_cache_chunks():
+    # Arrays scored by chunks or by threads hit the cache too
+    rng = np.random.RandomState(0)
+    proba = rng.dirichlet(np.ones(3), size=40)
+    X = np.column_stack([np.arange(40), rng.rand(40)])
+
+    for n_jobs in [1, 2]:
+        classifier = ChunkCountingClassifier(proba)
+        cache = ProbaCache(classifier)
+        for sampler_class in [ConfidenceSampler, MarginSampler,
+                              EntropySampler]:
+            sampler = sampler_class(cache, 3, assume_fitted=True,
+                                    chunk_size=10, n_jobs=n_jobs)
+            expected = sampler_class('precomputed', 3).select_samples(proba)
+            assert_array_equal(np.sort(sampler.select_samples(X)),
+                               np.sort(expected))
+        assert classifier.n_calls == 4
+
+        # Another pool is queried again
+        sampler.select_samples(X.copy())
+        assert classifier.n_calls == 8
@@ -0,0 +1,22 @@
+import numpy as np
+from numpy.testing import assert_array_equal
+
+from cardinal.utils import top_k
+
+
+def test_top_k_matches_stable_argsort():
+    rng = np.random.RandomState(0)
+
+    for _ in range(100):
+        n_samples = rng.randint(1, 50)
+        k = rng.randint(1, n_samples + 2)
+        # Few distinct values to have many ties
+        scores = rng.randint(0, 5, n_samples).astype(float)
+        scores[rng.rand(n_samples) < .1] = np.nan
+
+        expected = np.argsort(scores, kind='stable')[-k:]
+        assert_array_equal(top_k(scores, k), expected)
+
+        # Without tie breaking, only the scores are guaranteed
+        assert_array_equal(scores[top_k(scores, k, stable=False)],
+                           scores[expected])
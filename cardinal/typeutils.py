@@ -2,7 +2,8 @@ from typing import Union, Callable
 import numpy as np
 
 
-RandomStateType = Union[np.random.RandomState, int, None]
+RandomStateType = Union[np.random.RandomState, np.random.Generator, int,
+                        None]
 MetricType = Union[Callable, str]
 
 
@@ -12,7 +13,7 @@ def check_random_state(seed: RandomStateType):
     Args:
     seed : If seed is None, return the RandomState singleton used by np.random.
         If seed is an int, return a new RandomState instance seeded with seed.
-        If seed is already a RandomState instance, return it.
+        If seed is already a RandomState or a Generator instance, return it.
 
     Note
     ----
@@ -20,7 +21,7 @@ def check_random_state(seed: RandomStateType):
     """
     if isinstance(seed, int):
         return np.random.RandomState(seed)
-    if isinstance(seed, np.random.RandomState):
+    if isinstance(seed, (np.random.RandomState, np.random.Generator)):
         return seed
     return np.random.mtrand._rand
 
@@ -1,8 +1,10 @@
-from scipy.stats import entropy
+from scipy.special import entr
 import numpy as np
 
 from .base import ScoredQuerySampler
-from .typeutils import check_proba_estimator
+from .pool import ActiveLearningPool, read_slice
+from .typeutils import check_proba_estimator, RandomStateType
+from .utils import chunk_slices
 
 
 def _get_probability_classes(
@@ -27,6 +29,78 @@ def _get_probability_classes(
     return classwise_uncertainty
 
 
+def _get_slice_probability_classes(classifier, X, s: slice) -> np.ndarray:
+    """Returns the probabilities of a slice of rows of X, or of the unlabeled
+    samples of X if it is an ActiveLearningPool.
+
+    If classifier is a ProbaCache, probabilities already computed for the
+    same slice are reused and the samples are not even read.
+    """
+    if isinstance(classifier, ProbaCache):
+        return classifier.predict_slice_proba(X, s)
+    return _get_probability_classes(classifier, read_slice(X, s))
+
+
+UNCERTAINTY_KINDS = ('confidence', 'margin', 'entropy')
+
+
+def uncertainty_scores(classifier, X: np.ndarray, kinds=UNCERTAINTY_KINDS,
+                       block_size: int = 4096) -> dict:
+    """Computes several uncertainty scores from a single inference.
+
+    The classifier is queried once and all the scores are computed in one
+    pass over the probabilities, by blocks of rows so that temporary arrays
+    never exceed the size of a block. If X is an ActiveLearningPool, the
+    unlabeled samples are queried by blocks, so that only the probabilities
+    of a block are held in memory.
+
+    Args:
+        classifier: The classifier for which the labels are to be queried.
+        X: The pool of samples to query from, or an ActiveLearningPool.
+        kinds: Scores to compute among "confidence", "margin" and "entropy".
+        block_size: Number of rows processed at once.
+
+    Returns:
+        A dictionary mapping each kind to the scores of the samples. If X is
+        an ActiveLearningPool, these are the scores of the unlabeled samples.
+    """
+    for kind in kinds:
+        if kind not in UNCERTAINTY_KINDS:
+            raise ValueError('Unknown uncertainty score {}'.format(kind))
+
+    if isinstance(X, ActiveLearningPool):
+        n_samples = X.n_unlabeled
+
+        def get_block(rows):
+            return np.asarray(
+                _get_slice_probability_classes(classifier, X, rows))
+    else:
+        classwise_uncertainty = np.asarray(
+            _get_probability_classes(classifier, X))
+        n_samples = classwise_uncertainty.shape[0]
+
+        def get_block(rows):
+            return classwise_uncertainty[rows]
+
+    scores = {kind: np.empty(n_samples) for kind in kinds}
+
+    for rows in chunk_slices(n_samples, block_size):
+        block = get_block(rows)
+        if 'margin' in scores:
+            part = np.partition(block, -2, axis=1)
+            if 'confidence' in scores:
+                scores['confidence'][rows] = 1 - part[:, -1]
+            scores['margin'][rows] = 1 - (part[:, -1] - part[:, -2])
+        elif 'confidence' in scores:
+            scores['confidence'][rows] = 1 - np.max(block, axis=1)
+        if 'entropy' in scores:
+            # Same as scipy.stats.entropy, probabilities are normalized
+            normalized = block / np.sum(block, axis=1, keepdims=True)
+            scores['entropy'][rows] = np.sum(entr(normalized), axis=1)
+
+    return scores
+
+
 def confidence_score(classifier, X: np.ndarray) -> np.ndarray:
     """Measure the confidence score of a model for a set of samples.
 
@@ -37,9 +111,7 @@ def confidence_score(classifier, X: np.ndarray) -> np.ndarray:
     Returns:
         The confidence score for each sample.
     """
-    classwise_uncertainty = _get_probability_classes(classifier, X)
-    uncertainty = 1 - np.max(classwise_uncertainty, axis=1)
-    return uncertainty
+    return uncertainty_scores(classifier, X, ['confidence'])['confidence']
 
 
 def margin_score(classifier, X: np.ndarray) -> np.ndarray:
@@ -55,10 +127,7 @@ def margin_score(classifier, X: np.ndarray) -> np.ndarray:
     Returns:
         The margin score for each sample.
     """
-    classwise_uncertainty = _get_probability_classes(classifier, X)
-    part = np.partition(classwise_uncertainty, -2, axis=1)
-    margin = 1 - (part[:, -1] - part[:, -2])
-    return margin
+    return uncertainty_scores(classifier, X, ['margin'])['margin']
 
 
 def entropy_score(classifier, X: np.ndarray) -> np.ndarray:
@@ -70,14 +139,104 @@ def entropy_score(classifier, X: np.ndarray) -> np.ndarray:
     Args:
         classifier: The classifier for which the labels are to be queried.
         X: The pool of samples to query from.
-        n_instances: Number of samples to be queried.
 
     Returns:
         The entropy score for each label
     """
-    classwise_uncertainty = _get_probability_classes(classifier, X)
-    entropies = np.transpose(entropy(np.transpose(classwise_uncertainty)))
-    return entropies
+    return uncertainty_scores(classifier, X, ['entropy'])['entropy']
+
+
+class ProbaCache:
+    """Classifier wrapper computing the probabilities of a pool only once.
+
+    Samplers sharing a ProbaCache query the classifier once per pool instead
+    of once per sampler. A pool scored at once is recognized by identity, so
+    the same array object must be given to all the samplers. A pool scored
+    by slices, because it is an ActiveLearningPool or because chunk_size or
+    n_jobs are set, is recognized by identity and slice bounds. The
+    probabilities of each slice are then kept until another pool is scored
+    or, for an ActiveLearningPool, until samples are labeled. The cache is
+    cleared when the classifier is fitted.
+
+    Threads scoring slices of the same pool can share the cache. A slice
+    queried concurrently by two threads may be computed twice, with the
+    same result.
+
+    Args:
+        classifier: The classifier to wrap.
+
+    Attributes:
+        classifier: The wrapped classifier.
+    """
+    def __init__(self, classifier):
+        check_proba_estimator(classifier)
+        self.classifier = classifier
+        self.clear()
+
+    def clear(self):
+        """Forgets the cached probabilities."""
+        self._X = None
+        self._probas = None
+        self._source = None
+        self._slice_probas = {}
+
+    def fit(self, X: np.ndarray, y: np.ndarray) -> 'ProbaCache':
+        """Fits the wrapped classifier and clears the cache.
+
+        Args:
+            X: Labeled samples of shape (n_samples, n_features).
+            y: Labels of shape (n_samples).
+
+        Returns:
+            The object itself
+        """
+        self.clear()
+        self.classifier.fit(X, y)
+        return self
+
+    def predict_proba(self, X: np.ndarray) -> np.ndarray:
+        """Returns the probabilities of X, computed only if X is a new pool.
+
+        Args:
+            X: Samples to classify.
+
+        Returns:
+            The probability of each class for each sample.
+        """
+        if X is not self._X:
+            self._probas = _get_probability_classes(self.classifier, X)
+            self._X = X
+        return self._probas
+
+    def predict_slice_proba(self, X, s: slice) -> np.ndarray:
+        """Returns the probabilities of a slice of rows of X.
+
+        Probabilities are computed only if the slice was not queried since
+        another pool was scored by slices or, if X is an ActiveLearningPool,
+        since samples were labeled.
+
+        Args:
+            X: Samples to classify, or an ActiveLearningPool.
+            s: Slice of rows of X, or of positions among the unlabeled
+                samples if X is an ActiveLearningPool.
+
+        Returns:
+            The probability of each class for each sample of the slice.
+        """
+        # The index of unlabeled samples is rebuilt when samples are labeled.
+        # The source is referenced so that its identity cannot be reused.
+        source = (X.unlabeled_index if isinstance(X, ActiveLearningPool)
+                  else X)
+        if source is not self._source:
+            self._source = source
+            self._slice_probas = {}
+        key = (s.start, s.stop)
+        probas = self._slice_probas.get(key)
+        if probas is None:
+            probas = _get_probability_classes(
+                self.classifier, read_slice(X, s))
+            self._slice_probas[key] = probas
+        return probas
 
 
 class ConfidenceSampler(ScoredQuerySampler):
@@ -93,14 +252,26 @@ class ConfidenceSampler(ScoredQuerySampler):
         batch_size: Number of samples to draw when predicting.
         assume_fitted: If true, classifier is not refit
         verbose: The verbosity level. Defaults to 0.
+        chunk_size: If specified, the pool is scored by chunks of chunk_size
+            samples to bound memory usage.
+        n_jobs: Number of threads scoring shards of the pool concurrently.
+            -1 means using all cores. The classifier must support concurrent
+            calls to predict_proba.
+        temperature: Temperature of the "weighted" and "softmax" strategies.
+        random_state: Random seeding of the "weighted" and "softmax"
+            strategies.
     
     Attributes:
         classifier_: The fitted classifier.
     """
     def __init__(self, classifier, batch_size: int,
                  strategy: str = 'top', assume_fitted: bool = False,
-                 verbose: int = 0):
-        super().__init__(batch_size, strategy=strategy)
+                 verbose: int = 0, chunk_size: int = None, n_jobs: int = 1,
+                 temperature: float = 1.,
+                 random_state: RandomStateType = None):
+        super().__init__(batch_size, strategy=strategy,
+                         random_state=random_state, chunk_size=chunk_size,
+                         n_jobs=n_jobs, temperature=temperature)
         self.classifier_ = classifier
         self.assume_fitted = assume_fitted
         self.verbose = verbose
@@ -120,7 +291,8 @@ class ConfidenceSampler(ScoredQuerySampler):
             The object itself
         """
         if not self.assume_fitted:
-            self.classifier_.fit(X, y)
+            with self._stage('fit', X.shape[0]):
+                self.classifier_.fit(X, y)
         return self
 
     def score_samples(self, X: np.array) -> np.array:
@@ -132,7 +304,16 @@ class ConfidenceSampler(ScoredQuerySampler):
         Returns:
             The score of each sample according to lowest confidence estimation.
         """
-        return confidence_score(self.classifier_, X)
+        with self._stage('predict_proba', X.shape[0]):
+            probas = _get_probability_classes(self.classifier_, X)
+        return confidence_score('precomputed', probas)
+
+    def _score_slice(self, X, s: slice) -> np.array:
+        if not isinstance(self.classifier_, ProbaCache):
+            return super()._score_slice(X, s)
+        with self._stage('predict_proba', s.stop - s.start):
+            probas = self.classifier_.predict_slice_proba(X, s)
+        return confidence_score('precomputed', probas)
 
 
 class MarginSampler(ScoredQuerySampler):
@@ -150,14 +331,26 @@ class MarginSampler(ScoredQuerySampler):
         batch_size: Number of samples to draw when predicting.
         assume_fitted: If true, classifier is not refit
         verbose: The verbosity level. Defaults to 0.
+        chunk_size: If specified, the pool is scored by chunks of chunk_size
+            samples to bound memory usage.
+        n_jobs: Number of threads scoring shards of the pool concurrently.
+            -1 means using all cores. The classifier must support concurrent
+            calls to predict_proba.
+        temperature: Temperature of the "weighted" and "softmax" strategies.
+        random_state: Random seeding of the "weighted" and "softmax"
+            strategies.
     
     Attributes:
         classifier_: The fitted classifier.
     """
     def __init__(self, classifier, batch_size: int,
                  strategy: str = 'top', assume_fitted: bool = False,
-                 verbose: int = 0):
-        super().__init__(batch_size, strategy=strategy)
+                 verbose: int = 0, chunk_size: int = None, n_jobs: int = 1,
+                 temperature: float = 1.,
+                 random_state: RandomStateType = None):
+        super().__init__(batch_size, strategy=strategy,
+                         random_state=random_state, chunk_size=chunk_size,
+                         n_jobs=n_jobs, temperature=temperature)
         self.classifier_ = classifier
         self.assume_fitted = assume_fitted
         self.verbose = verbose
@@ -177,7 +370,8 @@ class MarginSampler(ScoredQuerySampler):
             The object itself
         """
         if not self.assume_fitted:
-            self.classifier_.fit(X, y)
+            with self._stage('fit', X.shape[0]):
+                self.classifier_.fit(X, y)
         return self
 
     def score_samples(self, X: np.array) -> np.array:
@@ -189,7 +383,16 @@ class MarginSampler(ScoredQuerySampler):
         Returns:
             The score of each sample according to lowest confidence estimation.
         """
-        return margin_score(self.classifier_, X)
+        with self._stage('predict_proba', X.shape[0]):
+            probas = _get_probability_classes(self.classifier_, X)
+        return margin_score('precomputed', probas)
+
+    def _score_slice(self, X, s: slice) -> np.array:
+        if not isinstance(self.classifier_, ProbaCache):
+            return super()._score_slice(X, s)
+        with self._stage('predict_proba', s.stop - s.start):
+            probas = self.classifier_.predict_slice_proba(X, s)
+        return margin_score('precomputed', probas)
 
 
 class EntropySampler(ScoredQuerySampler):
@@ -207,14 +410,26 @@ class EntropySampler(ScoredQuerySampler):
         batch_size: Number of samples to draw when predicting.
         assume_fitted: If true, classifier is not refit
         verbose: The verbosity level. Defaults to 0.
+        chunk_size: If specified, the pool is scored by chunks of chunk_size
+            samples to bound memory usage.
+        n_jobs: Number of threads scoring shards of the pool concurrently.
+            -1 means using all cores. The classifier must support concurrent
+            calls to predict_proba.
+        temperature: Temperature of the "weighted" and "softmax" strategies.
+        random_state: Random seeding of the "weighted" and "softmax"
+            strategies.
     
     Attributes:
         classifier_: The fitted classifier.
     """
     def __init__(self, classifier, batch_size: int,
                  strategy: str = 'top', assume_fitted: bool = False,
-                 verbose: int = 0):
-        super().__init__(batch_size, strategy=strategy)
+                 verbose: int = 0, chunk_size: int = None, n_jobs: int = 1,
+                 temperature: float = 1.,
+                 random_state: RandomStateType = None):
+        super().__init__(batch_size, strategy=strategy,
+                         random_state=random_state, chunk_size=chunk_size,
+                         n_jobs=n_jobs, temperature=temperature)
         self.classifier_ = classifier
         self.assume_fitted = assume_fitted
         self.verbose = verbose
@@ -234,7 +449,8 @@ class EntropySampler(ScoredQuerySampler):
             The object itself
         """
         if not self.assume_fitted:
-            self.classifier_.fit(X, y)
+            with self._stage('fit', X.shape[0]):
+                self.classifier_.fit(X, y)
         return self
 
     def score_samples(self, X: np.array) -> np.array:
@@ -246,4 +462,13 @@ class EntropySampler(ScoredQuerySampler):
         Returns:
             The score of each sample according to lowest confidence estimation.
         """
-        return entropy_score(self.classifier_, X)
+        with self._stage('predict_proba', X.shape[0]):
+            probas = _get_probability_classes(self.classifier_, X)
+        return entropy_score('precomputed', probas)
+
+    def _score_slice(self, X, s: slice) -> np.array:
+        if not isinstance(self.classifier_, ProbaCache):
+            return super()._score_slice(X, s)
+        with self._stage('predict_proba', s.stop - s.start):
+            probas = self.classifier_.predict_slice_proba(X, s)
+        return entropy_score('precomputed', probas)
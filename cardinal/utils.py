@@ -1,4 +1,7 @@
+import os
+
 import numpy as np
+from scipy import sparse
 
 from .typeutils import check_random_state
 
@@ -14,3 +17,175 @@ def pad_with_random(array, size, min, max, random_state=None):
     choices = choices[mask]
     padding = random_state.choice(choices, n_missing)
     return np.concatenate([array, padding])
+
+
+DEFAULT_CHUNK_SIZE = 65536
+
+
+def is_out_of_core(X):
+    """Tells if X is an array that should only be read by chunks.
+
+    Out-of-core arrays are np.memmap and any chunked array: an object with a
+    shape attribute whose __getitem__ accepts slices of rows and sorted lists
+    of row indices, returning arrays. HDF5 datasets (h5py) and zarr arrays
+    follow this protocol. Samplers read them sequentially by blocks of rows
+    and never load them entirely in memory.
+
+    Tables such as pandas DataFrames, whose __getitem__ selects columns, are
+    recognized by their iloc or columns attribute and are not out-of-core.
+
+    Args:
+        X: The array to check.
+
+    Returns:
+        True if X is out-of-core.
+    """
+    if isinstance(X, np.memmap):
+        return True
+    if isinstance(X, np.ndarray) or sparse.issparse(X):
+        return False
+    if hasattr(X, 'iloc') or hasattr(X, 'columns'):
+        return False
+    return hasattr(X, 'shape') and hasattr(X, '__getitem__')
+
+
+def iter_chunks(X, chunk_size):
+    """Reads an array sequentially by blocks of rows.
+
+    Args:
+        X: Array or chunked array of shape (n_samples, ...).
+        chunk_size: Maximum number of rows of a block.
+
+    Returns:
+        A generator of in-memory arrays of shape (chunk_size, ...).
+    """
+    for s in chunk_slices(X.shape[0], chunk_size):
+        yield read_rows(X, s)
+
+
+def read_rows(X, key):
+    """Reads rows of an array, a sparse matrix or a chunked array.
+
+    Args:
+        X: Array, sparse matrix, chunked array or table such as a pandas
+            DataFrame, whose rows are read through iloc.
+        key: Slice or sorted indices of the rows to read.
+
+    Returns:
+        The rows, as a sparse matrix if X is sparse, as an array otherwise.
+    """
+    rows = X.iloc[key] if hasattr(X, 'iloc') else X[key]
+    if sparse.issparse(rows):
+        return rows
+    return np.asarray(rows)
+
+
+def chunk_slices(n_samples, chunk_size):
+    """Generates slices splitting n_samples rows in chunks of chunk_size.
+
+    Args:
+        n_samples: Total number of rows.
+        chunk_size: Maximum number of rows in a chunk.
+
+    Returns:
+        A generator of slices covering range(n_samples) in order.
+    """
+    if chunk_size <= 0:
+        raise ValueError('chunk_size must be positive, got {}'.format(
+            chunk_size))
+    for start in range(0, n_samples, chunk_size):
+        yield slice(start, min(start + chunk_size, n_samples))
+
+
+def effective_n_jobs(n_jobs):
+    """Returns the number of workers to use for a given n_jobs.
+
+    Args:
+        n_jobs: Number of workers. None means 1, negative values mean using
+            all cores but (-n_jobs - 1), so -1 means using all cores.
+
+    Returns:
+        The number of workers, at least 1.
+    """
+    if n_jobs is None:
+        return 1
+    if n_jobs < 0:
+        return max(1, (os.cpu_count() or 1) + 1 + n_jobs)
+    if n_jobs == 0:
+        raise ValueError('n_jobs == 0 has no meaning')
+    return n_jobs
+
+
+def top_k(scores, k, stable=True):
+    """Returns the indices of the k highest scores, sorted by increasing score.
+
+    Uses a partial sort (np.argpartition) so that the cost is O(n + k log k)
+    instead of the O(n log n) of a full argsort.
+
+    Args:
+        scores: Scores of shape (n_samples).
+        k: Number of indices to return.
+        stable: If True, ties are broken deterministically and the result is
+            the same as np.argsort(scores, kind='stable')[-k:]. Otherwise,
+            ties on the k-th score are broken arbitrarily.
+
+    Returns:
+        Indices of the k highest scores of shape (k).
+    """
+    scores = np.asarray(scores)
+    n_samples = scores.shape[0]
+    if k <= 0:
+        return np.empty(0, dtype=np.intp)
+    if k >= n_samples:
+        return np.argsort(scores, kind='stable')
+
+    kth = n_samples - k
+    index = np.argpartition(scores, kth)[kth:]
+    threshold = scores[index[0]]
+
+    if stable and not np.isnan(threshold):
+        # The partition gives the right set of scores but an arbitrary subset
+        # of the samples tied with the threshold. A stable sort keeps the last
+        # ones, so we take the ties with the highest indices.
+        above = np.flatnonzero(~(scores <= threshold))  # Includes NaN
+        ties = np.flatnonzero(scores == threshold)
+        index = np.concatenate([above, ties[ties.shape[0] - k + above.shape[0]:]])
+        return index[np.lexsort((index, scores[index]))]
+    elif stable:
+        # NaN are sorted last, a full sort is the simplest way to be consistent
+        return np.argsort(scores, kind='stable')[kth:]
+
+    return index[np.argsort(scores[index])]
+
+
+def weighted_sampling_keys(log_weights, random_state=None):
+    """Computes random keys for weighted sampling without replacement.
+
+    Selecting the k samples with the highest keys is equivalent to drawing k
+    samples without replacement, each draw being proportional to the weights
+    of the remaining samples (Efraimidis and Spirakis). Keys are computed in
+    log space as log(w) - log(E) with E exponentially distributed, which is
+    stable for very small or large weights and allows softmax weights.
+
+    Args:
+        log_weights: Logarithm of the weights of shape (n_samples). Samples
+            with a weight of -inf or NaN are only drawn when no other is
+            left, uniformly at random.
+        random_state: Random seeding, can be a numpy Generator.
+
+    Returns:
+        Keys of shape (n_samples).
+    """
+    random_state = check_random_state(random_state)
+    log_weights = np.asarray(log_weights, dtype=float)
+    keys = np.log(random_state.standard_exponential(log_weights.shape[0]))
+    np.subtract(log_weights, keys, out=keys)
+
+    # Null weights get random keys lower than any other key, so that ties
+    # are not broken by index when fewer samples than requested can be drawn
+    null = ~(log_weights > -np.inf)
+    n_null = np.count_nonzero(null)
+    if n_null:
+        keys[null] = -np.finfo(float).max * (
+            1 - random_state.random(n_null) / 2)
+    return keys
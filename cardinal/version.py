@@ -25,13 +25,13 @@ __version__ = '0.0.4.dev'
 # This is a tuple to preserve order, so that dependencies are checked
 # in some meaningful order (more => less 'core').
 DEPENDENCIES_METADATA = (
-    ('numpy', {'min_version': '1.11'}),
+    ('numpy', {'min_version': '1.17'}),
     ('scipy', {'min_version': '0.19'}),
     ('scikit-learn', {
         'min_version': '0.19',
         'extra_options': ['sklearn', 'examples', 'submodular', 'doc']}),
     ('apricot-select', {
-        'min_version': '0.5.0', 'extra_options': ['submodular', 'doc']}),
+        'min_version': '0.6.0', 'extra_options': ['submodular', 'doc']}),
     ('matplotlib', {
         'min_version': '2.0', 'extra_options': ['examples', 'doc']}),
     ('sphinx-gallery', {
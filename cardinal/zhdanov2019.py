@@ -4,24 +4,55 @@ from .version import check_modules
 
 check_modules('sklearn', 'zhdanov2019')  # noqa
 
-from .base import BaseQuerySampler
+from .pipeline import SamplerPipeline
+from .pool import ActiveLearningPool
 from .uncertainty import MarginSampler
 from .clustering import KMeansSampler
 
 
-class TwoStepKMeansSampler(BaseQuerySampler):
+class TwoStepKMeansSampler(SamplerPipeline):
     """KMeans sampler using a margin uncertainty sampler as preselector
 
+    By default, beta * batch_size samples are preselected. If max_seconds is
+    specified, the preselection size is instead chosen at each selection so
+    that the selection is expected to take max_seconds. The time per sample
+    of the margin and KMeans stages is measured at each selection and
+    smoothed over iterations, and the preselection size is set to the number
+    of samples the KMeans stage can process in the time left by the margin
+    stage. It is kept between batch_size and the size of the pool, and
+    beta * batch_size samples are preselected at the first selection.
+
+    Args:
+        beta: Preselection size as a multiple of batch_size.
+        classifier: Classifier used by the margin sampler.
+        batch_size: Number of samples to select.
+        assume_fitted: If true, classifier is not refit
+        verbose: The verbosity level. Defaults to 0.
+        max_seconds: If specified, target duration of select_samples.
+        smoothing: Weight of the last measure in the moving averages of the
+            time per sample of each stage.
+        kmeans_args: Arguments of the KMeansSampler.
+
+    Attributes:
+        preselection_size_: Number of samples preselected at the last
+            selection.
     """
 
     def __init__(self, beta: int, classifier, batch_size: int,
-                 assume_fitted: bool = False, verbose: int = 0, **kmeans_args):
-        
+                 assume_fitted: bool = False, verbose: int = 0,
+                 max_seconds: float = None, smoothing: float = .5,
+                 **kmeans_args):
+        self.beta = beta
+        self.max_seconds = max_seconds
+        self.smoothing = smoothing
         self.sampler_list = [
             MarginSampler(classifier, beta * batch_size, strategy='top',
                           assume_fitted=assume_fitted, verbose=verbose),
             KMeansSampler(batch_size, **kmeans_args)
         ]
+        super().__init__([('preselection', self.sampler_list[0]),
+                          ('kmeans', self.sampler_list[1])])
+        self._seconds_per_sample = {}
 
     def fit(self, X: np.array, y: np.array = None) -> 'TwoStepKMeansSampler':
         """Fits the first query sampler
@@ -29,28 +60,53 @@ class TwoStepKMeansSampler(BaseQuerySampler):
         Args:
             X: Labeled samples of shape [n_samples, n_features].
             y: Labels of shape [n_samples].
-        
+
         Returns:
             The object itself
         """
         self.sampler_list[0].fit(X, y)
         return self
 
+    def _preselection_size(self, n_samples: int) -> int:
+        """Chooses the preselection size fitting in max_seconds."""
+        rates = self._seconds_per_sample
+        if 'preselection' not in rates or 'kmeans' not in rates:
+            size = self.beta * self.batch_size
+        else:
+            remaining = self.max_seconds - rates['preselection'] * n_samples
+            size = int(remaining / max(rates['kmeans'], 1e-12))
+        return int(np.clip(size, self.batch_size,
+                           max(n_samples, self.batch_size)))
+
     def select_samples(self, X: np.array,
                        sample_weight: np.array = None) -> np.array:
         """Selects the using uncertainty preselection and KMeans sampler.
 
         Args:
-            X: Pool of unlabeled samples of shape (n_samples, n_features).
+            X: Pool of unlabeled samples of shape (n_samples, n_features),
+                or an ActiveLearningPool.
             sample_weight: Weight of the samples of shape (n_samples),
                 optional.
 
         Returns:
             Indices of the selected samples of shape (batch_size).
         """
-        selected = self.sampler_list[0].select_samples(X)
-        new_selected = self.sampler_list[1].select_samples(
-            X[selected], sample_weight=sample_weight)
-        selected = selected[new_selected]
-        
+        if self.max_seconds is None:
+            # Drops the size adapted by a previous budgeted selection
+            self.sampler_list[0].batch_size = self.beta * self.batch_size
+            self.preselection_size_ = self.sampler_list[0].batch_size
+            return super().select_samples(X, sample_weight=sample_weight)
+
+        n_samples = (X.n_unlabeled if isinstance(X, ActiveLearningPool)
+                     else X.shape[0])
+        self.preselection_size_ = self._preselection_size(n_samples)
+        self.sampler_list[0].batch_size = self.preselection_size_
+        selected = super().select_samples(X, sample_weight=sample_weight)
+
+        # Update the moving averages of the time per sample of each stage
+        for name, seconds in self.stage_times_.items():
+            rate = seconds / max(self.stage_sizes_[name], 1)
+            previous = self._seconds_per_sample.get(name, rate)
+            self._seconds_per_sample[name] = (
+                self.smoothing * rate + (1 - self.smoothing) * previous)
         return selected
@@ -143,11 +143,11 @@ for i, (sampler_name, sampler) in enumerate(samplers):
             # This is an SSL method that requires 
             weights = ConfidenceSampler(model, batch_size).score_samples(X)
             weights[mask] = -1
-            selected = sampler.select_samples(X, samples_weights=weights)
+            selected = sampler.select_samples(X, sample_weight=weights)
             mask[selected] = True
         elif sampler_name == 'Weighted Kmeans':
             weights = ConfidenceSampler(model, batch_size).score_samples(X[~mask])
-            selected = sampler.select_samples(X[~mask], samples_weights=weights)
+            selected = sampler.select_samples(X[~mask], sample_weight=weights)
             mask[indices[~mask][selected]] = True
         else:
             selected = sampler.select_samples(X[~mask])
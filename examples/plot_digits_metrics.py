@@ -19,14 +19,15 @@ import numpy as np
 from sklearn.datasets import load_digits
 from sklearn.ensemble import RandomForestClassifier
 from sklearn.model_selection import train_test_split
-from sklearn.metrics import pairwise_distances
 
 from cardinal.uncertainty import ConfidenceSampler
 from cardinal.clustering import KMeansSampler
 from cardinal.random import RandomSampler
 from cardinal.plotting import plot_confidence_interval
 from cardinal.base import BaseQuerySampler
-from cardinal.metrics import ContradictionMonitor
+from cardinal.metrics import (AccuracyMonitor, ContradictionMonitor,
+                              ExplorationMonitor, MonitorSet)
+from cardinal.pool import ActiveLearningPool
 
 np.random.seed(7)
 
@@ -57,10 +58,8 @@ model = RandomForestClassifier()
 # the number of samples on which the model changes his prediction from one
 # iteration to the other is correlated to the improvement of accuracy. We
 # want to verify this. Since the number of label prediction changes can be
-# coarse, we use the absolute difference in prediction probabilities.
-
-def compute_contradiction(previous_proba, current_proba):
-    return np.abs(current_proba - previous_proba).mean()
+# coarse, we use the absolute difference in prediction probabilities. This is
+# what the ContradictionMonitor records.
 
 
 ##############################################################################
@@ -68,10 +67,12 @@ def compute_contradiction(previous_proba, current_proba):
 # samples and our test set. The goal of this metric is measure how well our
 # test set has been explored by our query sampling method so far. We expect
 # uncertainty sampling to explore the sample space located *nearby* the
-# decision boundary and show poor exploration property.
-
-def compute_exploration(X_selected, X_test):
-    return pairwise_distances(X_selected, X_test).mean()
+# decision boundary and show poor exploration property. The
+# ExplorationMonitor records the mean distance between labeled samples and
+# test samples.
+#
+# Both monitors, along with accuracy, are grouped in a MonitorSet which is
+# fed with a single prediction of the model on the test set per iteration.
 
 ##############################################################################
 # A New Custom Sampler
@@ -147,37 +148,38 @@ for i, (sampler_name, sampler) in enumerate(samplers):
         X_train, X_test, y_train, y_test = \
             train_test_split(X, y, test_size=500, random_state=k)
 
-        accuracies = []
-        contradictions = ContradictionMonitor()
-        explorations = []
-
-        previous_proba = None
+        monitors = MonitorSet({
+            'accuracy': AccuracyMonitor(y_test),
+            'contradiction': ContradictionMonitor(),
+            'exploration': ExplorationMonitor(X_test),
+        })
 
         # For simplicity, we start with one sample of each class
         _, selected = np.unique(y_train, return_index=True)
 
-        # We use binary masks to simplify some operations
-        mask = np.zeros(X_train.shape[0], dtype=bool)
-        indices = np.arange(X_train.shape[0])
-        mask[selected] = True
+        # The pool tracks labeled samples. Samplers select among its
+        # unlabeled samples and return indices in X_train.
+        pool = ActiveLearningPool(X_train, y_train, labeled=selected)
 
         # The classic active learning loop
         for j in range(n_iter):
-            model.fit(X_train[mask], y_train[mask])
-
-            # Record metrics
-            accuracies.append(model.score(X_test, y_test))
-            explorations.append(compute_exploration(X_train[mask], X_test))
-            contradictions.accumulate(len(selected),
-                                      model.predict_proba(X_test))
-
-            sampler.fit(X_train[mask], y_train[mask])
-            selected = sampler.select_samples(X_train[~mask])
-            mask[indices[~mask][selected]] = True
-
-        all_accuracies.append(accuracies)
-        all_explorations.append(explorations)
-        all_contradictions.append(contradictions.get()['contradictions'])
+            X_labeled, y_labeled = pool.get_labeled()
+            model.fit(X_labeled, y_labeled)
+
+            # Record metrics. The exploration monitor is given the newly
+            # labeled samples only.
+            monitors.accumulate(pool.n_labeled, model.predict_proba(X_test),
+                                X_selected=X_train[selected])
+
+            sampler.fit(X_labeled, y_labeled)
+            selected = sampler.select_samples(pool)
+            pool.label(selected)
+
+        results = monitors.get()
+        all_accuracies.append(results['accuracy']['accuracies'])
+        all_explorations.append(results['exploration']['explorations'])
+        all_contradictions.append(
+            results['contradiction']['contradictions'])
     
     x_data = np.arange(10, batch_size * (n_iter - 1) + 11, batch_size)
 
@@ -78,12 +78,13 @@ if __name__ == "__main__":
               'Operating System :: POSIX',
               'Operating System :: Unix',
               'Operating System :: MacOS',
-              'Programming Language :: Python :: 3.5',
-              'Programming Language :: Python :: 3.6',
-              'Programming Language :: Python :: 3.7',
+              'Programming Language :: Python :: 3.8',
+              'Programming Language :: Python :: 3.9',
+              'Programming Language :: Python :: 3.10',
+              'Programming Language :: Python :: 3.11',
           ],
           packages=find_packages(),
           package_data={},
-          python_requires='>=3.5',
+          python_requires='>=3.8',
           install_requires=install_requires,
           extras_require=extras_require)